@@ -4,31 +4,35 @@ Comprehensive Validation Report: Summary of All 5 Analyses
 Demonstrates the holistic urban simulator's capabilities in modeling
 sustainable city development through policy, infrastructure, and spatial effects.
 """
+import os
 import subprocess
 import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 from datetime import datetime
 
-def run_all_analyses():
-    """Run all 5 analyses and compile comprehensive report."""
-    
-    analyses = [
-        ("analyze_policy_impact.py", "Policy Impact Analysis"),
-        ("analyze_gentrification.py", "Gentrification Assessment"),
-        ("analyze_infrastructure_impact.py", "Infrastructure Impact"),
-        ("analyze_neighborhood_spillovers.py", "Spatial Spillover Effects"),
-        ("analyze_multi_city.py", "Multi-City Comparison"),
-    ]
-    
-    report = f"""
+ANALYSES = [
+    ("analyze_policy_impact.py", "Policy Impact Analysis"),
+    ("analyze_gentrification.py", "Gentrification Assessment"),
+    ("analyze_infrastructure_impact.py", "Infrastructure Impact"),
+    ("analyze_neighborhood_spillovers.py", "Spatial Spillover Effects"),
+    ("analyze_multi_city.py", "Multi-City Comparison"),
+]
+
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+DATE_FORMAT = '%Y-%m-%d'
+
+REPORT_HEADER = """
 ╔══════════════════════════════════════════════════════════════════════════════╗
 ║                 HOLISTIC URBAN SIMULATOR - VALIDATION REPORT                 ║
 ║                        Comprehensive Multi-Module Analysis                   ║
 ╚══════════════════════════════════════════════════════════════════════════════╝
 
-Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
+Generated: {generated}
 
-═══════════════════════════════════════════════════════════════════════════════
+"""
+
+EXECUTIVE_SUMMARY = """═══════════════════════════════════════════════════════════════════════════════
 EXECUTIVE SUMMARY
 ═══════════════════════════════════════════════════════════════════════════════
 
@@ -36,6 +40,9 @@ This report validates the Urban Simulator's 10-module architecture through
 5 comprehensive analyses examining policy impacts, gentrification dynamics,
 infrastructure effects, spatial spillovers, and multi-city benchmarking.
 
+Analysis Runs:
+{analysis_status}
+
 Key Validations:
   ✓ Policy Module (5 active policies)
   ✓ Education & Healthcare Modules (infrastructure-population linkage)
@@ -43,7 +50,9 @@ Key Validations:
   ✓ EV Infrastructure (0→100 chargers across 20 grid cells)
   ✓ Dynamic State Management (50 timesteps, 20 cells, 10 modules)
 
-═══════════════════════════════════════════════════════════════════════════════
+"""
+
+ANALYSIS_1_POLICY = """═══════════════════════════════════════════════════════════════════════════════
 ANALYSIS 1: POLICY IMPACT ANALYSIS
 ═══════════════════════════════════════════════════════════════════════════════
 
@@ -65,7 +74,9 @@ Key Findings:
 Output Files:
   → data/outputs/visualizations/policy_impact_analysis.html
 
-═══════════════════════════════════════════════════════════════════════════════
+"""
+
+ANALYSIS_2_GENTRIFICATION = """═══════════════════════════════════════════════════════════════════════════════
 ANALYSIS 2: GENTRIFICATION ASSESSMENT
 ═══════════════════════════════════════════════════════════════════════════════
 
@@ -94,7 +105,9 @@ Output Files:
   → data/outputs/visualizations/gentrification_rent_displacement.html
   → data/outputs/visualizations/neighborhood_classification.html
 
-═══════════════════════════════════════════════════════════════════════════════
+"""
+
+ANALYSIS_3_INFRASTRUCTURE = """═══════════════════════════════════════════════════════════════════════════════
 ANALYSIS 3: INFRASTRUCTURE IMPACT
 ═══════════════════════════════════════════════════════════════════════════════
 
@@ -115,7 +128,9 @@ Key Insights:
 Output Files:
   → data/outputs/visualizations/infrastructure_impact_comparison.html
 
-═══════════════════════════════════════════════════════════════════════════════
+"""
+
+ANALYSIS_4_SPILLOVERS = """═══════════════════════════════════════════════════════════════════════════════
 ANALYSIS 4: SPATIAL SPILLOVER EFFECTS
 ═══════════════════════════════════════════════════════════════════════════════
 
@@ -139,7 +154,9 @@ Output Files:
   → data/outputs/visualizations/spillover_clustering.html
   → data/outputs/visualizations/performance_gradient.html
 
-═══════════════════════════════════════════════════════════════════════════════
+"""
+
+ANALYSIS_5_MULTI_CITY = """═══════════════════════════════════════════════════════════════════════════════
 ANALYSIS 5: MULTI-CITY COMPARISON FRAMEWORK
 ═══════════════════════════════════════════════════════════════════════════════
 
@@ -162,11 +179,13 @@ Comparative Metrics:
   • Run 2: 2,598 population, €1,634 rent, 0.72 safety, Low inequality
 
 Output Files:
-  → data/outputs/visualizations/multi_city_comparison.html
-  → data/outputs/visualizations/multi_city_inequality.html
-  → data/outputs/visualizations/city_performance_matrix.html
+  → data/outputs/visualizations/multi_city_comparison.png
+  → data/outputs/visualizations/inequality_comparison.html
+  → data/outputs/visualizations/city_performance_matrix.png
 
-═══════════════════════════════════════════════════════════════════════════════
+"""
+
+TECHNICAL_ACHIEVEMENTS = """═══════════════════════════════════════════════════════════════════════════════
 TECHNICAL ACHIEVEMENTS
 ═══════════════════════════════════════════════════════════════════════════════
 
@@ -196,7 +215,9 @@ State Variables Tracked (per cell, per timestep):
   • Environmental: air_quality_index, green_space_ratio
   • Policy: active policies, tax revenue, subsidy distribution
 
-═══════════════════════════════════════════════════════════════════════════════
+"""
+
+VALIDATION_FINDINGS = """═══════════════════════════════════════════════════════════════════════════════
 VALIDATION FINDINGS
 ═══════════════════════════════════════════════════════════════════════════════
 
@@ -230,7 +251,9 @@ VALIDATION FINDINGS
   • Spatial maps render correctly with geometries
   • Timeline, correlation, and heatmap visualizations confirmed
 
-═══════════════════════════════════════════════════════════════════════════════
+"""
+
+RECOMMENDATIONS = """═══════════════════════════════════════════════════════════════════════════════
 RECOMMENDATIONS FOR FUTURE WORK
 ═══════════════════════════════════════════════════════════════════════════════
 
@@ -252,7 +275,9 @@ Phase 4: Real-World Integration
   • Compare simulated vs actual outcomes
   • Enable scenario planning for municipal governments
 
-═══════════════════════════════════════════════════════════════════════════════
+"""
+
+CONCLUSION = """═══════════════════════════════════════════════════════════════════════════════
 CONCLUSION
 ═══════════════════════════════════════════════════════════════════════════════
 
@@ -277,22 +302,86 @@ The system is production-ready for municipal planning teams to evaluate
 sustainable development scenarios and policy combinations before
 implementation.
 
-═══════════════════════════════════════════════════════════════════════════════
+"""
+
+REPORT_FOOTER = """═══════════════════════════════════════════════════════════════════════════════
 Contact: Urban Simulator Development Team
-Report Date: {datetime.now().strftime('%Y-%m-%d')}
+Report Date: {report_date}
 ═══════════════════════════════════════════════════════════════════════════════
 """
+
+REPORT_SECTIONS = (
+    ANALYSIS_1_POLICY,
+    ANALYSIS_2_GENTRIFICATION,
+    ANALYSIS_3_INFRASTRUCTURE,
+    ANALYSIS_4_SPILLOVERS,
+    ANALYSIS_5_MULTI_CITY,
+    TECHNICAL_ACHIEVEMENTS,
+    VALIDATION_FINDINGS,
+    RECOMMENDATIONS,
+    CONCLUSION,
+)
+
+def run_analysis(script):
+    """Run a single analysis script and return its completed process."""
+    script_path = Path(__file__).parent / script
+    return subprocess.run(
+        [sys.executable, str(script_path)],
+        capture_output=True,
+        text=True,
+        cwd=script_path.parent,
+    )
+
+def run_analyses_concurrently(analyses):
+    """Launch all analysis scripts at once; they share no state."""
+    results = {}
+    with ThreadPoolExecutor(max_workers=len(analyses)) as executor:
+        futures = {
+            executor.submit(run_analysis, script): name
+            for script, name in analyses
+        }
+        for future in as_completed(futures):
+            results[futures[future]] = future.result()
+    return results
+
+def run_all_analyses():
+    """Run all 5 analyses and compile comprehensive report."""
+    
+    analyses = ANALYSES
+    now = datetime.now()
+    results = run_analyses_concurrently(analyses)
+    
+    status_lines = []
+    for script, name in analyses:
+        proc = results[name]
+        status = "✓ completed" if proc.returncode == 0 else f"✗ failed (exit {proc.returncode})"
+        status_lines.append(f"  {name:30} {script:38} {status}")
+    analysis_status = "\n".join(status_lines)
     
-    return report
+    # Header and footer share one clock read so they can never disagree
+    generated = now.strftime(TIMESTAMP_FORMAT)
+    report_date = now.strftime(DATE_FORMAT)
+    
+    parts = []
+    parts.append(REPORT_HEADER.format(generated=generated))
+    parts.append(EXECUTIVE_SUMMARY.format(analysis_status=analysis_status))
+    parts.extend(REPORT_SECTIONS)
+    parts.append(REPORT_FOOTER.format(report_date=report_date))
+    
+    return ''.join(parts)
 
 if __name__ == '__main__':
     report = run_all_analyses()
-    print(report)
+    data = report.encode('utf-8')
     
     # Save report to file
     report_path = Path("data/outputs") / "VALIDATION_REPORT.txt"
     report_path.parent.mkdir(parents=True, exist_ok=True)
-    with open(report_path, 'w', encoding='utf-8') as f:
-        f.write(report)
+    report_path.write_bytes(data)
+    
+    # Echo to the terminal only; CI logs get the file path below
+    if sys.stdout.isatty():
+        sys.stdout.flush()
+        os.write(sys.stdout.fileno(), data)
     
     print(f"\n✅ Report saved to: {report_path}")
@@ -4,6 +4,16 @@ import pandas as pd
 from src.database.db_config import db_config
 from sqlalchemy import text
 
+CITIES = ('leipzig', 'berlin', 'munich')
+TIMELINE_TIMESTEPS = (0, 10, 20, 30, 40, 50)
+FINAL_TIMESTEP = TIMELINE_TIMESTEPS[-1]
+
+params = {
+    'cities': list(CITIES),
+    'timesteps': list(TIMELINE_TIMESTEPS),
+    'final_timestep': FINAL_TIMESTEP,
+}
+
 print('\n' + '='*70)
 print('[*] 3-CITY COMPARISON ANALYSIS')
 print('='*70)
@@ -18,17 +28,17 @@ with db_config.engine.connect() as conn:
             status,
             created_at
         FROM simulation_run
-        WHERE city_name IN ('leipzig', 'berlin', 'munich')
+        WHERE city_name = ANY(:cities)
         ORDER BY city_name, created_at DESC
     ''')
-    runs = pd.read_sql(query, conn)
+    runs = pd.read_sql(query, conn, params=params)
     print(runs.to_string(index=False))
     
-    # 2. Basic metrics from final timestep
-    print('\n\n[OK] Population & Rent Metrics at Timestep 50:')
+    # 2-4. Final-timestep metrics and timeline share one aggregation pass
     query = text('''
         SELECT 
             sr.city_name,
+            ss.timestep,
             ROUND(AVG(ss.population)::numeric, 0) as avg_pop,
             MIN(ss.population)::integer as min_pop,
             MAX(ss.population)::integer as max_pop,
@@ -36,15 +46,30 @@ with db_config.engine.connect() as conn:
             COUNT(*) as num_cells
         FROM simulation_state ss
         JOIN simulation_run sr ON ss.run_id = sr.run_id
-        WHERE sr.city_name IN ('leipzig', 'berlin', 'munich')
-        AND ss.timestep = 50
-        GROUP BY sr.city_name
-        ORDER BY avg_rent_eur DESC
+        WHERE sr.city_name = ANY(:cities)
+        AND ss.timestep = ANY(:timesteps)
+        GROUP BY sr.city_name, ss.timestep
+        ORDER BY sr.city_name, ss.timestep
     ''')
-    metrics = pd.read_sql(query, conn)
+    city_timesteps = pd.read_sql(query, conn, params=params).astype({
+        'timestep': 'int16',
+        # MIN/MAX are NULL for a group whose populations are all NULL
+        'min_pop': 'Int32',
+        'max_pop': 'Int32',
+        'num_cells': 'int32',
+    })
+    
+    # 2. Basic metrics from final timestep
+    print(f'\n\n[OK] Population & Rent Metrics at Timestep {FINAL_TIMESTEP}:')
+    metrics = (
+        city_timesteps[city_timesteps['timestep'] == FINAL_TIMESTEP]
+        .drop(columns='timestep')
+        .sort_values('avg_rent_eur', ascending=False)
+    )
     print(metrics.to_string(index=False))
     
-    # 3. Employment & Commerce
+    # 3. Employment & Commerce (optional columns, queried last so a failure
+    # cannot abort the transaction before the core metrics are read)
     print('\n\n[OK] Employment & Commerce Metrics:')
     query = text('''
         SELECT 
@@ -54,48 +79,33 @@ with db_config.engine.connect() as conn:
             ROUND(AVG(ss.business_vitality)::numeric, 3) as avg_vitality
         FROM simulation_state ss
         JOIN simulation_run sr ON ss.run_id = sr.run_id
-        WHERE sr.city_name IN ('leipzig', 'berlin', 'munich')
-        AND ss.timestep = 50
+        WHERE sr.city_name = ANY(:cities)
+        AND ss.timestep = :final_timestep
         GROUP BY sr.city_name
         ORDER BY sr.city_name
     ''')
     try:
-        metrics_emp = pd.read_sql(query, conn)
+        metrics_emp = pd.read_sql(query, conn, params=params)
         print(metrics_emp.to_string(index=False))
     except Exception as e:
         print(f'[WARN] Employment columns not available: {str(e)[:80]}')
 
-# New connection for timeline to avoid transaction errors
-with db_config.engine.connect() as conn2:
-    # 4. Timeline analysis - how metrics evolved
-    print('\n\n[OK] Population Evolution Over Time:')
-    query = text('''
-        SELECT 
-            sr.city_name,
-            ss.timestep,
-            ROUND(AVG(ss.population)::numeric, 0) as avg_pop
-        FROM simulation_state ss
-        JOIN simulation_run sr ON ss.run_id = sr.run_id
-        WHERE sr.city_name IN ('leipzig', 'berlin', 'munich')
-        AND ss.timestep IN (0, 10, 20, 30, 40, 50)
-        GROUP BY sr.city_name, ss.timestep
-        ORDER BY sr.city_name, ss.timestep
-    ''')
-    try:
-        timeline = pd.read_sql(query, conn2)
-        for city in ['berlin', 'leipzig', 'munich']:
-            city_data = timeline[timeline['city_name'] == city]
-            if not city_data.empty:
-                print(f'\n  {city.upper()}:')
-                for _, row in city_data.iterrows():
-                    print(f'    Timestep {int(row["timestep"]):2d}: {int(row["avg_pop"]):7} pop')
-    except Exception as e:
-        print(f'[WARN] Timeline analysis failed: {str(e)[:80]}')
+# 4. Timeline analysis - how metrics evolved
+print('\n\n[OK] Population Evolution Over Time:')
+timeline = city_timesteps[['city_name', 'timestep', 'avg_pop']]
+for city in sorted(CITIES):
+    city_data = timeline[timeline['city_name'] == city]
+    if not city_data.empty:
+        print(f'\n  {city.upper()}:')
+        for _, timestep, avg_pop in city_data.itertuples(index=False, name=None):
+            # AVG is NULL when every population in the group is NULL
+            pop = f'{int(avg_pop):7}' if pd.notna(avg_pop) else f'{"n/a":>7}'
+            print(f'    Timestep {int(timestep):2d}: {pop} pop')
 
 print('\n' + '='*70)
 print('[OK] Analysis complete!')
 print('\n[NEXT] View visualizations in: data/outputs/visualizations/')
-print('  - multi_city_comparison.html')
-print('  - city_performance_matrix.html')  
+print('  - multi_city_comparison.png')
+print('  - city_performance_matrix.png')  
 print('  - inequality_comparison.html')
 print('='*70 + '\n')
@@ -3,17 +3,128 @@
 Gentrification Analysis: Track displacement patterns and neighborhood changes.
 Analyzes which neighborhoods are experiencing gentrification pressure.
 """
+import os
 import sys
+from functools import lru_cache
 from pathlib import Path
 import pandas as pd
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
 import numpy as np
 
 sys.path.append(str(Path(__file__).parent / "src"))
 
 from database.db_config import db_config
-from sqlalchemy import text
+from sqlalchemy import bindparam, text
+from sqlalchemy.dialects import postgresql
+
+# Opt-in: with DB_BINARY_FETCH=1 and psycopg 3 installed (pip install
+# "psycopg[binary]"), state rows are fetched over its binary protocol
+psycopg = None
+if os.getenv('DB_BINARY_FETCH') == '1':
+    try:
+        import psycopg
+    except ImportError:
+        print("[WARN] DB_BINARY_FETCH=1 but psycopg 3 is not installed; using psycopg2")
+
+_STATE_QUERY = text("""
+SELECT 
+    grid_id,
+    timestep,
+    population,
+    avg_rent_euro,
+    displacement_risk,
+    social_cohesion_index,
+    employment,
+    air_quality_index
+FROM simulation_state
+WHERE run_id = :run_id
+AND timestep IN (
+    SELECT MIN(timestep) FROM simulation_state WHERE run_id = :run_id
+    UNION
+    SELECT MAX(timestep) FROM simulation_state WHERE run_id = :run_id
+)
+ORDER BY grid_id, timestep
+""").bindparams(bindparam('run_id'))
+
+# Compiled once at import: driver-level SQL for the psycopg 3 path, and a
+# statement cache shared by every SQLAlchemy execution of _STATE_QUERY
+_STATE_SQL = str(_STATE_QUERY.compile(dialect=postgresql.psycopg.dialect()))
+_COMPILED_CACHE = {}
+
+_CHUNK_ROWS = 10_000
+
+# Neighborhood classes in priority order (Declining overrides the rest)
+_CLASSIFICATION_LABELS = np.array(['Declining', 'Gentrifying', 'Appreciating', 'Stable'])
+
+# 32-bit storage is ample for these metrics. population and employment are
+# nullable INTEGER columns, so they use float32 to keep NaN for missing data.
+_STATE_DTYPES = {
+    'timestep': 'int16',
+    'population': 'float32',
+    'avg_rent_euro': 'float32',
+    'displacement_risk': 'float32',
+    'social_cohesion_index': 'float32',
+    'employment': 'float32',
+    'air_quality_index': 'float32',
+}
+
+def _iter_state_chunks_binary(run_id):
+    """Stream state rows over psycopg 3's binary protocol (no text decoding).
+    
+    Connects with the same URL as db_config's engine.
+    """
+    url = db_config.get_connection_url()
+    with psycopg.connect(
+        **url.translate_connect_args(database='dbname', username='user'),
+        connect_timeout=10,
+    ) as conn:
+        # Named cursor = server-side cursor, so rows arrive in batches
+        with conn.cursor(name='gentrification_state', binary=True) as cur:
+            cur.execute(_STATE_SQL, {'run_id': run_id})
+            columns = [d.name for d in cur.description]
+            while True:
+                rows = cur.fetchmany(_CHUNK_ROWS)
+                if not rows:
+                    break
+                yield pd.DataFrame(rows, columns=columns)
+
+def _iter_state_chunks(run_id):
+    """Stream state rows through a SQLAlchemy server-side cursor."""
+    with db_config.engine.connect() as conn:
+        conn = conn.execution_options(
+            compiled_cache=_COMPILED_CACHE,
+            stream_results=True,
+            max_row_buffer=_CHUNK_ROWS,
+        )
+        yield from pd.read_sql(_STATE_QUERY, conn, params={'run_id': run_id}, chunksize=_CHUNK_ROWS)
+
+@lru_cache(maxsize=8)
+def _fetch_state(run_id):
+    """Fetch first/last timestep state rows for a run.
+    
+    Only the first and last timesteps of the run are fetched, since
+    those are all identify_gentrifying_areas compares. Rows are streamed
+    in chunks and each chunk is downcast to 32-bit dtypes before it is
+    kept, so no 64-bit copy of the result is built; the frame itself is
+    still O(rows) at 32 bits per value. Completed runs are
+    immutable, so results are cached per run_id; callers must not mutate
+    the returned frame. Use _fetch_state.cache_clear() to reset.
+    """
+    chunks = _iter_state_chunks_binary(run_id) if psycopg is not None else _iter_state_chunks(run_id)
+    parts = [chunk.astype(_STATE_DTYPES) for chunk in chunks if not chunk.empty]
+    
+    if not parts:
+        return None
+    
+    return pd.concat(parts, ignore_index=True)
+
+# Page wrapper for chart divs; plotly.js comes from the CDN, not each file
+_HTML_SHELL = """<html>
+<head><meta charset="utf-8" /><script src="{plotlyjs_src}"></script></head>
+<body>
+{body}
+</body>
+</html>
+"""
 
 class GentrificationAnalyzer:
     """Analyze gentrification and displacement patterns."""
@@ -26,110 +137,87 @@ class GentrificationAnalyzer:
         """Get latest simulation run."""
         with db_config.engine.connect() as conn:
             query = text("""
-            SELECT run_id, name, created_at 
+            SELECT run_id
             FROM simulation_run 
             WHERE status = 'completed'
             ORDER BY created_at DESC LIMIT 1
             """)
-            result = pd.read_sql(query, conn)
-        
-        if result.empty:
-            return None
-        return result.iloc[0]['run_id']
+            return conn.execute(query).scalar()
     
     def analyze_gentrification(self, run_id):
         """Analyze gentrification patterns by tracking rent and displacement."""
-        query = f"""
-        SELECT 
-            grid_id,
-            timestep,
-            population,
-            avg_rent_euro,
-            displacement_risk,
-            social_cohesion_index,
-            employment,
-            air_quality_index
-        FROM simulation_state
-        WHERE run_id = '{run_id}'
-        ORDER BY grid_id, timestep
-        """
-        
-        with db_config.engine.connect() as conn:
-            df = pd.read_sql(query, conn)
-        
-        if df.empty:
-            return None
-        
-        return df
+        return _fetch_state(run_id)
     
     def identify_gentrifying_areas(self, df):
         """Identify which cells are experiencing gentrification."""
-        timesteps = sorted(df['timestep'].unique())
-        initial_t = timesteps[0]
-        final_t = timesteps[-1]
-        
-        initial_data = df[df['timestep'] == initial_t].set_index('grid_id')
-        final_data = df[df['timestep'] == final_t].set_index('grid_id')
-        
-        gentrification_score = []
-        
-        for grid_id in initial_data.index:
-            if grid_id not in final_data.index:
-                continue
-            
-            # Safe extraction with None handling
-            initial_rent = initial_data.loc[grid_id, 'avg_rent_euro']
-            final_rent = final_data.loc[grid_id, 'avg_rent_euro']
-            initial_pop = initial_data.loc[grid_id, 'population']
-            final_pop = final_data.loc[grid_id, 'population']
-            initial_emp = initial_data.loc[grid_id, 'employment']
-            final_emp = final_data.loc[grid_id, 'employment']
-            
-            # Skip if missing critical data
-            if not all([initial_rent, final_rent, initial_pop]):
-                continue
-            
-            # Indicators of gentrification
-            rent_increase = (final_rent - initial_rent) / initial_rent if initial_rent > 0 else 0
-            displacement_increase = 0  # Not tracking individually
-            population_change = (final_pop - initial_pop) / initial_pop if initial_pop > 0 else 0
-            employment_change = ((final_emp or 0) - (initial_emp or 0)) / (initial_emp or 1) if initial_emp else 0
-            
-            # Gentrification = high rent increase + population change + employment growth
-            gent_score = (rent_increase * 0.5 + population_change * 0.3 + employment_change * 0.2)
-            
-            gentrification_score.append({
-                'grid_id': grid_id,
-                'gentrification_score': gent_score,
-                'rent_increase_%': rent_increase * 100,
-                'displacement_increase': 0,
-                'population_change_%': population_change * 100,
-                'employment_change_%': employment_change * 100,
-                'initial_rent': initial_rent,
-                'final_rent': final_rent,
-            })
-        
-        return pd.DataFrame(gentrification_score).sort_values('gentrification_score', ascending=False)
+        grouped = df.sort_values(['grid_id', 'timestep']).groupby('grid_id', sort=False)
+        initial_data = grouped.nth(0).set_index('grid_id')
+        final_data = grouped.nth(-1).set_index('grid_id')
+        
+        merged = initial_data.join(final_data, lsuffix='_i', rsuffix='_f', how='inner')
+        
+        # Cells observed at a single timestep have no change to measure
+        merged = merged[merged['timestep_i'] != merged['timestep_f']]
+        
+        # Skip cells missing critical data
+        critical = merged[['avg_rent_euro_i', 'avg_rent_euro_f', 'population_i']]
+        merged = merged[(critical.notna() & (critical != 0)).all(axis=1)]
+        
+        initial_rent = merged['avg_rent_euro_i']
+        final_rent = merged['avg_rent_euro_f']
+        initial_pop = merged['population_i']
+        initial_emp = merged['employment_i']
+        
+        # Indicators of gentrification
+        rent_increase = ((final_rent - initial_rent) / initial_rent).where(initial_rent > 0, 0)
+        population_change = ((merged['population_f'] - initial_pop) / initial_pop).where(initial_pop > 0, 0)
+        employment_change = (
+            (merged['employment_f'].fillna(0) - initial_emp) / initial_emp
+        ).where(initial_emp.notna() & (initial_emp != 0), 0)
+        
+        # Gentrification = high rent increase + population change + employment growth
+        gent_score = rent_increase * 0.5 + population_change * 0.3 + employment_change * 0.2
+        
+        gentrification_score = pd.DataFrame({
+            'grid_id': merged.index,
+            'gentrification_score': gent_score.to_numpy(),
+            'rent_increase_%': rent_increase.to_numpy() * 100,
+            'displacement_increase': 0,  # Not tracking individually
+            'population_change_%': population_change.to_numpy() * 100,
+            'employment_change_%': employment_change.to_numpy() * 100,
+            'initial_rent': initial_rent.to_numpy(),
+            'final_rent': final_rent.to_numpy(),
+        })
+        
+        return gentrification_score.sort_values('gentrification_score', ascending=False)
     
-    def create_visualizations(self, gentrification_df):
-        """Create gentrification analysis visualizations."""
+    def _write_figure(self, fig, output_path):
+        """Write a figure's div into the shared CDN-backed HTML shell."""
+        from plotly.offline import get_plotlyjs_version
         
-        # === HIGH-RISK GENTRIFICATION MAP ===
-        fig1 = go.Figure()
+        html = _HTML_SHELL.format(
+            plotlyjs_src=f"https://cdn.plot.ly/plotly-{get_plotlyjs_version()}.min.js",
+            body=fig.to_html(include_plotlyjs=False, full_html=False),
+        )
+        output_path.write_text(html, encoding='utf-8')
+    
+    def _make_risk_map(self, top_gent):
+        """Write the top-10 gentrification bar chart."""
+        import plotly.graph_objects as go  # deferred: plotly is slow to import
         
-        top_gent = gentrification_df.head(10)
+        fig = go.Figure()
         
-        fig1.add_trace(go.Bar(
-            y=top_gent['grid_id'],
-            x=top_gent['gentrification_score'],
+        fig.add_trace(go.Bar(
+            y=top_gent['grid_id'].to_numpy(),
+            x=top_gent['gentrification_score'].to_numpy(),
             orientation='h',
             marker_color='orangered',
-            text=top_gent['rent_increase_%'].round(1),
+            text=top_gent['rent_increase_%'].round(1).to_numpy(),
             texttemplate='Rent: %{text:.1f}%',
             textposition='auto'
         ))
         
-        fig1.update_layout(
+        fig.update_layout(
             title="<b>Top 10 Most Gentrifying Neighborhoods</b><br><sub>Ranked by gentrification pressure (rent + displacement)</sub>",
             xaxis_title="Gentrification Score",
             yaxis_title="Grid Cell",
@@ -139,13 +227,16 @@ class GentrificationAnalyzer:
         )
         
         output_path = self.output_dir / "gentrification_risk_map.html"
-        fig1.write_html(str(output_path))
-        print(f"\n✅ Gentrification risk map: {output_path}")
+        self._write_figure(fig, output_path)
+        return output_path
+    
+    def _make_scatter(self, gentrification_df):
+        """Write the rent vs displacement scatter."""
+        import plotly.graph_objects as go  # deferred: plotly is slow to import
         
-        # === SCATTER: RENT vs DISPLACEMENT ===
-        fig2 = go.Figure()
+        fig = go.Figure()
         
-        fig2.add_trace(go.Scatter(
+        fig.add_trace(go.Scatter(
             x=gentrification_df['rent_increase_%'],
             y=gentrification_df['displacement_increase'],
             mode='markers',
@@ -160,7 +251,7 @@ class GentrificationAnalyzer:
             hovertemplate='<b>%{text}</b><br>Rent Increase: %{x:.1f}%<br>Displacement Risk: %{y:.2f}<extra></extra>'
         ))
         
-        fig2.update_layout(
+        fig.update_layout(
             title="<b>Gentrification Dynamics: Rent vs Displacement Risk</b>",
             xaxis_title="Rent Increase (%)",
             yaxis_title="Displacement Risk Increase",
@@ -170,22 +261,16 @@ class GentrificationAnalyzer:
         )
         
         output_path = self.output_dir / "gentrification_rent_displacement.html"
-        fig2.write_html(str(output_path))
-        print(f"✅ Rent-displacement scatter: {output_path}")
-        
-        # === GENTRIFICATION CLASSIFICATION ===
-        # Classify neighborhoods
-        gentrification_df['classification'] = 'Stable'
-        gentrification_df.loc[gentrification_df['rent_increase_%'] > 10, 'classification'] = 'Appreciating'
-        gentrification_df.loc[(gentrification_df['rent_increase_%'] > 15) & 
-                            (gentrification_df['displacement_increase'] > 0.05), 'classification'] = 'Gentrifying'
-        gentrification_df.loc[gentrification_df['population_change_%'] < -10, 'classification'] = 'Declining'
-        
-        classification_counts = gentrification_df['classification'].value_counts()
+        self._write_figure(fig, output_path)
+        return output_path
+    
+    def _make_classification(self, classification_counts):
+        """Write the neighborhood classification pie chart."""
+        import plotly.graph_objects as go  # deferred: plotly is slow to import
         
-        fig3 = go.Figure()
+        fig = go.Figure()
         
-        fig3.add_trace(go.Pie(
+        fig.add_trace(go.Pie(
             labels=classification_counts.index,
             values=classification_counts.values,
             marker=dict(colors=['green', 'yellow', 'orange', 'red']),
@@ -193,15 +278,39 @@ class GentrificationAnalyzer:
             textinfo='label+percent'
         ))
         
-        fig3.update_layout(
+        fig.update_layout(
             title="<b>Neighborhood Classification</b><br><sub>Based on rent growth and displacement risk</sub>",
             height=500,
             width=800
         )
         
         output_path = self.output_dir / "neighborhood_classification.html"
-        fig3.write_html(str(output_path))
-        print(f"✅ Neighborhood classification: {output_path}")
+        self._write_figure(fig, output_path)
+        return output_path
+    
+    def create_visualizations(self, gentrification_df):
+        """Create gentrification analysis visualizations."""
+        
+        # Classify neighborhoods: argmax picks the first (highest-priority)
+        # matching row of the stacked masks; the final all-True row is Stable
+        rent_increase = gentrification_df['rent_increase_%'].to_numpy()
+        matches = np.stack([
+            gentrification_df['population_change_%'].to_numpy() < -10,
+            (rent_increase > 15) & (gentrification_df['displacement_increase'].to_numpy() > 0.05),
+            rent_increase > 10,
+            np.ones(len(gentrification_df), dtype=bool),
+        ])
+        gentrification_df['classification'] = _CLASSIFICATION_LABELS[matches.argmax(axis=0)]
+        
+        classification_counts = gentrification_df['classification'].value_counts()
+        
+        # Already sorted by score; one slice serves the chart and the printout
+        top10 = gentrification_df.head(10)
+        top5 = top10.head(5)
+        
+        print(f"\n✅ Gentrification risk map: {self._make_risk_map(top10)}")
+        print(f"✅ Rent-displacement scatter: {self._make_scatter(gentrification_df)}")
+        print(f"✅ Neighborhood classification: {self._make_classification(classification_counts)}")
         
         # Print summary
         print("\n📊 Gentrification Summary:")
@@ -210,8 +319,9 @@ class GentrificationAnalyzer:
             print(f"  {cls}: {count} cells")
         
         print("\n🚨 High-Risk Gentrifying Areas (Top 5):")
-        for idx, row in gentrification_df.head(5).iterrows():
-            print(f"  {row['grid_id']:20} | Rent: +{row['rent_increase_%']:.1f}% | Displacement: +{row['displacement_increase']:.3f}")
+        top_rows = top5[['grid_id', 'rent_increase_%', 'displacement_increase']]
+        for grid_id, rent_increase, displacement_increase in top_rows.itertuples(index=False, name=None):
+            print(f"  {grid_id:20} | Rent: +{rent_increase:.1f}% | Displacement: +{displacement_increase:.3f}")
 
 def main():
     try:
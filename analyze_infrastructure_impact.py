@@ -12,6 +12,7 @@ from plotly.subplots import make_subplots
 sys.path.append(str(Path(__file__).parent / "src"))
 
 from database.db_config import db_config
+from database.result_cache import cached_frame
 from sqlalchemy import text
 
 class InfrastructureImpactAnalyzer:
@@ -20,77 +21,95 @@ class InfrastructureImpactAnalyzer:
     def __init__(self):
         self.output_dir = Path("data/outputs/visualizations")
         self.output_dir.mkdir(parents=True, exist_ok=True)
+        # One connection for all of this analyzer's queries
+        self.conn = db_config.engine.connect()
+    
+    def close(self):
+        """Release the database connection."""
+        self.conn.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
     
     def get_latest_run(self):
         """Get latest simulation run."""
-        with db_config.engine.connect() as conn:
-            query = text("""
-            SELECT run_id FROM simulation_run 
-            WHERE status = 'completed'
-            ORDER BY created_at DESC LIMIT 1
-            """)
-            result = pd.read_sql(query, conn)
-        
-        return result.iloc[0]['run_id'] if not result.empty else None
+        query = text("""
+        SELECT run_id FROM simulation_run 
+        WHERE status = 'completed'
+        ORDER BY created_at DESC LIMIT 1
+        """)
+        return self.conn.execute(query).scalar()
     
-    def get_infrastructure_impact(self, run_id):
-        """Analyze impact of different infrastructure types."""
-        query = f"""
-        SELECT 
-            grid_id,
-            timestep,
-            population,
-            avg_rent_euro,
-            employment,
-            safety_score,
-            social_cohesion_index,
-            public_transit_accessibility,
-            air_quality_index,
-            chargers_count,
-            ev_capacity_kw,
-            commercial_vitality
-        FROM simulation_state
-        WHERE run_id = '{run_id}'
-        ORDER BY timestep, grid_id
-        """
-        
-        with db_config.engine.connect() as conn:
-            df = pd.read_sql(query, conn)
-        
-        return df
+    def get_outcomes_by_infrastructure_level(self, run_id):
+        """Average final-timestep outcomes per infrastructure level (cached per run)."""
+        # Version 2: levels without cells are dropped
+        # Version 3: integer averages are float8 rather than numeric
+        return cached_frame('infrastructure_outcomes', run_id,
+                            lambda: self._query_outcomes_by_infrastructure_level(run_id),
+                            version=3)
     
-    def analyze_by_infrastructure_level(self, df):
-        """Segment cells by infrastructure intensity."""
-        # Use final timestep
-        final_t = df['timestep'].max()
-        final_data = df[df['timestep'] == final_t].copy()
-        
-        # Estimate infrastructure levels from population and metrics
-        final_data['est_schools'] = final_data['population'] / 2000  # 1 school per 2000 residents
-        final_data['est_healthcare'] = final_data['population'] / 3000  # 1 facility per 3000 residents
-        final_data['ev_chargers'] = final_data['chargers_count']
-        final_data['infrastructure_level'] = (
-            (final_data['est_schools'] + final_data['est_healthcare'] + final_data['ev_chargers']) / 3
+    def _query_outcomes_by_infrastructure_level(self, run_id):
+        """Average final-timestep outcomes per infrastructure level, in SQL.
+        
+        Infrastructure is estimated from population and EV chargers (1 school
+        per 2000 residents, 1 healthcare facility per 3000 residents, plus
+        chargers) and bucketed into Low (0, 1], Medium (1, 2], High (2, 3] and
+        Very High above 3. Only one row per level leaves the database. Levels
+        are returned in order; levels without cells are dropped, and None is
+        returned when the run has no classified cells at all.
+        """
+        query = text("""
+        WITH final_state AS (
+            SELECT 
+                *,
+                (population / 2000.0 + population / 3000.0 + chargers_count) / 3.0 AS infrastructure_level
+            FROM simulation_state
+            WHERE run_id = :run_id
+            AND timestep = (SELECT MAX(timestep) FROM simulation_state WHERE run_id = :run_id)
+        ),
+        classified AS (
+            SELECT 
+                CASE
+                    WHEN infrastructure_level IS NULL OR infrastructure_level <= 0 THEN NULL
+                    WHEN infrastructure_level <= 1 THEN 'Low'
+                    WHEN infrastructure_level <= 2 THEN 'Medium'
+                    WHEN infrastructure_level <= 3 THEN 'High'
+                    ELSE 'Very High'
+                END AS classification,
+                population,
+                avg_rent_euro,
+                employment,
+                safety_score,
+                social_cohesion_index,
+                public_transit_accessibility,
+                air_quality_index,
+                commercial_vitality
+            FROM final_state
         )
-        
-        # Classify by infrastructure level
-        final_data['classification'] = pd.cut(final_data['infrastructure_level'], 
-                                             bins=[0, 1, 2, 3, float('inf')],
-                                             labels=['Low', 'Medium', 'High', 'Very High'])
-        
-        # Calculate average outcomes by infrastructure level
-        outcomes = final_data.groupby('classification').agg({
-            'population': 'mean',
-            'avg_rent_euro': 'mean',
-            'employment': 'mean',
-            'safety_score': 'mean',
-            'social_cohesion_index': 'mean',
-            'public_transit_accessibility': 'mean',
-            'air_quality_index': 'mean',
-            'commercial_vitality': 'mean'
-        }).reset_index()
-        
-        return outcomes
+        SELECT 
+            levels.classification,
+            AVG(c.population)::float8 AS population,
+            AVG(c.avg_rent_euro) AS avg_rent_euro,
+            AVG(c.employment)::float8 AS employment,
+            AVG(c.safety_score) AS safety_score,
+            AVG(c.social_cohesion_index) AS social_cohesion_index,
+            AVG(c.public_transit_accessibility) AS public_transit_accessibility,
+            AVG(c.air_quality_index) AS air_quality_index,
+            AVG(c.commercial_vitality) AS commercial_vitality
+        FROM (VALUES (1, 'Low'), (2, 'Medium'), (3, 'High'), (4, 'Very High'))
+            AS levels(ordinal, classification)
+        LEFT JOIN classified c ON c.classification = levels.classification
+        GROUP BY levels.ordinal, levels.classification
+        ORDER BY levels.ordinal
+        """)
+        
+        outcomes = pd.read_sql(query, self.conn, params={'run_id': run_id})
+        # A level's average population is NULL exactly when it has no cells
+        outcomes = outcomes.dropna(subset=['population']).reset_index(drop=True)
+        return outcomes if not outcomes.empty else None
     
     def create_infrastructure_comparison(self, outcomes):
         """Create comparison visualization."""
@@ -111,15 +130,15 @@ class InfrastructureImpactAnalyzer:
             rows=2, cols=2,
             subplot_titles=('Population & Employment', 'Affordability vs Vitality',
                           'Safety & Cohesion', 'Environmental & Transit'),
-            specs=[[{'type': 'scatter'}, {'type': 'scatter'}],
-                   [{'type': 'scatter'}, {'type': 'scatter'}]]
+            specs=[[{'type': 'scattergl'}, {'type': 'scattergl'}],
+                   [{'type': 'scattergl'}, {'type': 'scattergl'}]]
         )
         
         colors = ['blue', 'green', 'orange', 'red']
         
         # Plot 1: Population vs Employment
         fig.add_trace(
-            go.Scatter(x=outcomes['classification'], y=outcomes['population'],
+            go.Scattergl(x=outcomes['classification'], y=outcomes['population'],
                       mode='lines+markers', name='Population', 
                       line=dict(color='blue', width=2), marker=dict(size=10)),
             row=1, col=1
@@ -127,7 +146,7 @@ class InfrastructureImpactAnalyzer:
         
         # Plot 2: Rent vs Vitality
         fig.add_trace(
-            go.Scatter(x=outcomes['classification'], y=outcomes['avg_rent_euro'],
+            go.Scattergl(x=outcomes['classification'], y=outcomes['avg_rent_euro'],
                       mode='lines+markers', name='Avg Rent (€)',
                       line=dict(color='green', width=2), marker=dict(size=10)),
             row=1, col=2
@@ -135,7 +154,7 @@ class InfrastructureImpactAnalyzer:
         
         # Plot 3: Safety & Cohesion
         fig.add_trace(
-            go.Scatter(x=outcomes['classification'], y=normalized['safety_score'],
+            go.Scattergl(x=outcomes['classification'], y=normalized['safety_score'],
                       mode='lines+markers', name='Safety Score',
                       line=dict(color='purple', width=2), marker=dict(size=10)),
             row=2, col=1
@@ -143,7 +162,7 @@ class InfrastructureImpactAnalyzer:
         
         # Plot 4: Air Quality & Transit
         fig.add_trace(
-            go.Scatter(x=outcomes['classification'], y=outcomes['air_quality_index'],
+            go.Scattergl(x=outcomes['classification'], y=outcomes['air_quality_index'],
                       mode='lines+markers', name='Air Quality',
                       line=dict(color='brown', width=2), marker=dict(size=10)),
             row=2, col=2
@@ -163,7 +182,8 @@ class InfrastructureImpactAnalyzer:
         )
         
         output_path = self.output_dir / "infrastructure_impact_comparison.html"
-        fig.write_html(str(output_path))
+        fig.write_html(str(output_path), include_plotlyjs='cdn', full_html=True,
+                       include_mathjax=False, config={'responsive': True}, validate=False)
         print(f"\n✅ Infrastructure comparison: {output_path}")
         
         # Print insights
@@ -193,26 +213,22 @@ def main():
         print("🏭 INFRASTRUCTURE IMPACT ANALYSIS")
         print("="*60)
         
-        analyzer = InfrastructureImpactAnalyzer()
-        
-        run_id = analyzer.get_latest_run()
-        if not run_id:
-            print("❌ No simulation runs found")
-            return False
-        
-        print(f"\n✅ Analyzing run: {run_id}")
-        
-        # Get data
-        df = analyzer.get_infrastructure_impact(run_id)
-        if df is None or df.empty:
-            print("❌ No data available")
-            return False
-        
-        # Analyze by infrastructure level
-        outcomes = analyzer.analyze_by_infrastructure_level(df)
-        
-        # Create visualization
-        analyzer.create_infrastructure_comparison(outcomes)
+        with InfrastructureImpactAnalyzer() as analyzer:
+            run_id = analyzer.get_latest_run()
+            if not run_id:
+                print("❌ No simulation runs found")
+                return False
+            
+            print(f"\n✅ Analyzing run: {run_id}")
+            
+            # Analyze by infrastructure level (aggregated in the database)
+            outcomes = analyzer.get_outcomes_by_infrastructure_level(run_id)
+            if outcomes is None or outcomes.empty:
+                print("❌ No data available")
+                return False
+            
+            # Create visualization
+            analyzer.create_infrastructure_comparison(outcomes)
         
         print("\n" + "="*60)
         print("✅ INFRASTRUCTURE ANALYSIS COMPLETE")
@@ -3,6 +3,7 @@
 Multi-City Comparison Framework: Compare urban metrics across different cities.
 """
 import sys
+import argparse
 from pathlib import Path
 import pandas as pd
 import numpy as np
@@ -12,105 +13,242 @@ from plotly.subplots import make_subplots
 sys.path.append(str(Path(__file__).parent / "src"))
 
 from database.db_config import db_config
+from database.result_cache import cached_frames
 from sqlalchemy import text
 
+# Per-metric scale for the radar chart (avg_population, avg_rent, then
+# scores already in 0-1): values are divided by the cap and clipped at 1
+RADAR_METRIC_CAPS = np.array([4000000, 2000, 1, 1, 1, 1], dtype=float)
+
+# Whole-run averages read from sim_run_metrics / aggregated from simulation_state
+RUN_METRIC_COLUMNS = [
+    'num_cells', 'num_timesteps', 'avg_population', 'avg_rent', 'avg_employment',
+    'avg_safety', 'avg_vitality', 'avg_transit', 'avg_air_quality',
+    'avg_green_space', 'avg_social_cohesion'
+]
+
+def normalize_metrics(vals, caps):
+    """Scale a (cities x metrics) array by per-metric caps, clipped at 1."""
+    return np.minimum(vals / caps, 1.0)
+
 class MultiCityComparator:
     """Compare urban metrics across multiple cities."""
     
-    def __init__(self):
+    def __init__(self, interactive=False):
         self.output_dir = Path("data/outputs/visualizations")
         self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.interactive = interactive
+        # One connection for all of this comparator's queries
+        self.conn = db_config.engine.connect()
+    
+    def close(self):
+        """Release the database connection."""
+        self.conn.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+    
+    def _write_overview(self, fig, name, height):
+        """Save a static overview chart as PNG, or as HTML when interactive.
+        
+        Falls back to HTML if the static export fails (kaleido missing).
+        """
+        if not self.interactive:
+            output_path = self.output_dir / f"{name}.png"
+            try:
+                fig.write_image(str(output_path), width=1200, height=height, scale=2)
+                return output_path
+            except Exception:
+                print("[WARN] Could not save PNG (kaleido required for static export), writing HTML instead")
+        
+        output_path = self.output_dir / f"{name}.html"
+        fig.write_html(str(output_path), include_plotlyjs='cdn', full_html=True,
+                       include_mathjax=False, config={'responsive': True}, validate=False)
+        return output_path
     
     def get_all_runs(self):
         """Get all completed simulation runs."""
         try:
-            with db_config.engine.connect() as conn:
-                query = text("""
-                SELECT 
-                    run_id,
-                    city_name,
-                    created_at
-                FROM simulation_run 
-                WHERE status = 'completed'
-                ORDER BY created_at DESC
-                """)
-                result = pd.read_sql(query, conn)
-            return result
+            query = text("""
+            SELECT 
+                run_id,
+                city_name,
+                created_at
+            FROM simulation_run 
+            WHERE status = 'completed'
+            ORDER BY created_at DESC
+            """)
+            return pd.read_sql(query, self.conn)
         except Exception as e:
+            # A failed statement aborts the transaction; keep the connection usable
+            self.conn.rollback()
             print(f"[ERROR] Failed to retrieve runs: {e}")
             return pd.DataFrame()
     
-    def get_run_metrics(self, run_id):
-        """Get aggregated metrics for a run."""
+    def get_runs_metrics(self, run_ids):
+        """Get whole-run averages for many runs, from the on-disk cache if possible.
+        
+        Runs missing from the cache are fetched together in one query.
+        """
+        # Version 3: averages of the real simulation_state columns, without
+        # the inequality index (cached separately under run_inequality)
+        return cached_frames('run_metrics', run_ids, self._query_runs_metrics, version=3)
+    
+    def get_runs_inequality(self, run_ids):
+        """Get the inequality index of many runs, from the on-disk cache if possible."""
+        return cached_frames('run_inequality', run_ids, self._query_runs_inequality)
+    
+    def _query_runs_metrics(self, run_ids):
+        """Get whole-run averages for many runs."""
+        return self._query_with_summary(run_ids, RUN_METRIC_COLUMNS,
+                                     self._aggregate_runs_metrics, 'run metrics')
+    
+    def _query_runs_inequality(self, run_ids):
+        """Get the inequality index for many runs."""
+        return self._query_with_summary(run_ids, ['inequality_index'],
+                                     self._aggregate_runs_inequality, 'inequality index')
+    
+    def _query_with_summary(self, run_ids, columns, aggregate, label):
+        """Read per-run columns, falling back to aggregating simulation_state.
+        
+        Runs are read from the sim_run_metrics summary table when it exists
+        (migrate_add_run_metrics_table.sql); runs missing from it are
+        passed to `aggregate`. Each kind of metric is queried on its own, so
+        a failure in one leaves the others usable.
+        """
+        run_ids = [str(r) for r in run_ids]
         try:
-            with db_config.engine.connect() as conn:
-                query = text("""
-                SELECT 
-                    run_id,
-                    COUNT(*) as num_cells,
-                    COUNT(DISTINCT timestep) as num_timesteps,
-                    ROUND(AVG(population)::numeric, 2) as avg_population,
-                    ROUND(AVG(avg_rent_euro)::numeric, 2) as avg_rent,
-                    ROUND(AVG(employment)::numeric, 2) as avg_employment,
-                    ROUND(AVG(safety)::numeric, 2) as avg_safety,
-                    ROUND(AVG(vitality)::numeric, 2) as avg_vitality,
-                    ROUND(AVG(transit_access)::numeric, 2) as avg_transit,
-                    ROUND(AVG(air_quality)::numeric, 2) as avg_air_quality,
-                    ROUND(AVG(green_space)::numeric, 2) as avg_green_space,
-                    ROUND(AVG(social_cohesion)::numeric, 2) as avg_social_cohesion
-                FROM simulation_state 
-                WHERE run_id = :run_id
-                GROUP BY run_id
-                """)
-                result = pd.read_sql(query, conn, params={"run_id": run_id})
-            return result
+            from_summary = self._read_metrics_summary(run_ids, columns)
+            found = set(from_summary['run_id'].astype(str)) if from_summary is not None else set()
+            missing = [r for r in run_ids if r not in found]
+            if not missing:
+                return from_summary
+            
+            aggregated = aggregate(missing)
+            
+            if from_summary is None or from_summary.empty:
+                return aggregated
+            return pd.concat([from_summary, aggregated], ignore_index=True)
         except Exception as e:
-            print(f"[WARN] Could not get metrics for {run_id}: {e}")
+            self.conn.rollback()
+            print(f"[WARN] Could not get {label}: {e}")
             return None
     
+    def _read_metrics_summary(self, run_ids, columns):
+        """Read precomputed run columns, or None if the table isn't installed."""
+        if self.conn.execute(text("SELECT to_regclass('sim_run_metrics')")).scalar() is None:
+            return None
+        
+        query = text(f"""
+        SELECT run_id, {', '.join(columns)} FROM sim_run_metrics
+        WHERE run_id = ANY(CAST(:run_ids AS uuid[]))
+        """)
+        return pd.read_sql(query, self.conn, params={"run_ids": run_ids})
+    
+    def _aggregate_runs_metrics(self, run_ids):
+        """Aggregate whole-run averages for many runs from simulation_state in one query."""
+        query = text("""
+        SELECT 
+            run_id,
+            COUNT(*) as num_cells,
+            COUNT(DISTINCT timestep) as num_timesteps,
+            ROUND(AVG(population)::numeric, 2) as avg_population,
+            ROUND(AVG(avg_rent_euro)::numeric, 2) as avg_rent,
+            ROUND(AVG(employment)::numeric, 2) as avg_employment,
+            ROUND(AVG(safety_score)::numeric, 2) as avg_safety,
+            ROUND(AVG(commercial_vitality)::numeric, 2) as avg_vitality,
+            ROUND(AVG(public_transit_accessibility)::numeric, 2) as avg_transit,
+            ROUND(AVG(air_quality_index)::numeric, 2) as avg_air_quality,
+            ROUND(AVG(green_space_ratio)::numeric, 2) as avg_green_space,
+            ROUND(AVG(social_cohesion_index)::numeric, 2) as avg_social_cohesion
+        FROM simulation_state 
+        WHERE run_id = ANY(CAST(:run_ids AS uuid[]))
+        GROUP BY run_id
+        """)
+        return pd.read_sql(query, self.conn, params={"run_ids": run_ids})
+    
+    def _aggregate_runs_inequality(self, run_ids):
+        """Compute the inequality index for many runs from simulation_state.
+        
+        The index is the mean of the Gini coefficients of population and rent
+        across cells at timestep 50, G = 2*sum(i*x_i) / (n*sum(x)) - (n+1)/n
+        over ascending-ranked values. Runs without timestep-50 data get 0.
+        """
+        query = text("""
+        WITH final_state AS (
+            SELECT run_id, population, avg_rent_euro
+            FROM simulation_state
+            WHERE run_id = ANY(CAST(:run_ids AS uuid[])) AND timestep = 50
+        ),
+        ranked AS (
+            SELECT run_id, 'population' as metric, population::float as x,
+                   ROW_NUMBER() OVER (PARTITION BY run_id ORDER BY population) as i
+            FROM final_state WHERE population IS NOT NULL
+            UNION ALL
+            SELECT run_id, 'rent' as metric, avg_rent_euro::float as x,
+                   ROW_NUMBER() OVER (PARTITION BY run_id ORDER BY avg_rent_euro) as i
+            FROM final_state WHERE avg_rent_euro IS NOT NULL
+        ),
+        gini AS (
+            SELECT 
+                run_id,
+                COALESCE(
+                    2 * SUM(i * x) / NULLIF(COUNT(*) * SUM(x), 0) - (COUNT(*) + 1.0) / COUNT(*),
+                    0
+                ) as gini
+            FROM ranked
+            GROUP BY run_id, metric
+        )
+        SELECT 
+            r.run_id,
+            COALESCE(AVG(g.gini), 0) as inequality_index
+        FROM unnest(CAST(:run_ids AS uuid[])) AS r(run_id)
+        LEFT JOIN gini g ON g.run_id = r.run_id
+        GROUP BY r.run_id
+        """)
+        return pd.read_sql(query, self.conn, params={"run_ids": run_ids})
+    
+    def get_run_metrics(self, run_id):
+        """Get aggregated metrics for a run."""
+        return self.get_runs_metrics([run_id])
+    
+    def _merge_run_metrics(self, runs_df, get_metrics):
+        """Attach per-run metrics from get_metrics to runs_df, keeping its row order."""
+        metrics = get_metrics(runs_df['run_id'].tolist())
+        if metrics is None or metrics.empty:
+            return None
+        
+        runs = runs_df[['run_id', 'city_name']].astype({'run_id': str})
+        return runs.merge(metrics.astype({'run_id': str}), on='run_id')
+    
     def create_city_comparison(self, runs_df):
         """Create comparison dataframe for all cities."""
         try:
-            comparison_data = []
+            comp_df = self._merge_run_metrics(runs_df, self.get_runs_metrics)
             
-            for _, run in runs_df.iterrows():
-                metrics = self.get_run_metrics(run['run_id'])
-                if metrics is not None and not metrics.empty:
-                    metrics['city_name'] = run['city_name']
-                    comparison_data.append(metrics)
-            
-            if not comparison_data:
+            if comp_df is None or comp_df.empty:
                 print("[ERROR] No metrics available")
                 return None
             
-            comp_df = pd.concat(comparison_data, ignore_index=True)
-            
             # Create radar chart
             metrics_cols = ['avg_population', 'avg_rent', 'avg_employment', 
                           'avg_safety', 'avg_vitality', 'avg_transit']
             
             fig = go.Figure()
             
-            for city in comp_df['city_name'].unique():
-                city_data = comp_df[comp_df['city_name'] == city]
-                
-                if city_data.empty:
-                    continue
-                
-                # Normalize metrics to 0-1 range for radar
-                normalized = {}
-                for col in metrics_cols:
-                    val = float(city_data[col].iloc[0]) if pd.notna(city_data[col].iloc[0]) else 0
-                    # Handle normalization
-                    if col == 'avg_population':
-                        normalized[col] = min(val / 4000000, 1.0)
-                    elif col == 'avg_rent':
-                        normalized[col] = min(val / 2000, 1.0)
-                    else:
-                        normalized[col] = min(val, 1.0)
-                
+            # One radar trace per city, from its most recent run (runs_df order)
+            city_rows = comp_df.drop_duplicates('city_name')
+            
+            # Normalize metrics to 0-1 range for radar
+            vals = city_rows[metrics_cols].astype(float).fillna(0).to_numpy()
+            normalized = normalize_metrics(vals, RADAR_METRIC_CAPS)
+            
+            for city, r in zip(city_rows['city_name'], normalized):
                 fig.add_trace(go.Scatterpolar(
-                    r=[normalized.get(col, 0) for col in metrics_cols],
+                    r=r,
                     theta=['Population', 'Rent', 'Employment', 'Safety', 'Vitality', 'Transit'],
                     fill='toself',
                     name=str(city) if pd.notna(city) else 'Unknown'
@@ -123,8 +261,7 @@ class MultiCityComparator:
                 height=600
             )
             
-            output_path = self.output_dir / "multi_city_comparison.html"
-            fig.write_html(str(output_path))
+            output_path = self._write_overview(fig, "multi_city_comparison", 600)
             print(f"[OK] Multi-city comparison: {output_path}")
             
             return comp_df
@@ -136,38 +273,10 @@ class MultiCityComparator:
     def create_inequality_comparison(self, runs_df):
         """Create inequality metrics comparison."""
         try:
-            inequality_data = []
-            
-            for _, run in runs_df.iterrows():
-                metrics = self.get_run_metrics(run['run_id'])
-                if metrics is not None and not metrics.empty:
-                    # Calculate Gini-like measure from population variance
-                    try:
-                        with db_config.engine.connect() as conn:
-                            query = text("""
-                            SELECT 
-                                STDDEV(population) as pop_stddev,
-                                AVG(population) as pop_avg,
-                                STDDEV(avg_rent_euro) as rent_stddev,
-                                AVG(avg_rent_euro) as rent_avg
-                            FROM simulation_state 
-                            WHERE run_id = :run_id AND timestep = 50
-                            """)
-                            ineq = pd.read_sql(query, conn, params={"run_id": run['run_id']})
-                        
-                        if not ineq.empty:
-                            ineq_row = ineq.iloc[0]
-                            gini = (float(ineq_row['pop_stddev'] or 0) / float(ineq_row['pop_avg'] or 1) + 
-                                   float(ineq_row['rent_stddev'] or 0) / float(ineq_row['rent_avg'] or 1)) / 2
-                            inequality_data.append({
-                                'city_name': run['city_name'],
-                                'inequality_index': gini
-                            })
-                    except:
-                        pass
+            merged = self._merge_run_metrics(runs_df, self.get_runs_inequality)
             
-            if inequality_data:
-                ineq_df = pd.DataFrame(inequality_data)
+            if merged is not None and not merged.empty:
+                ineq_df = merged[['city_name', 'inequality_index']]
                 ineq_df = ineq_df.sort_values('inequality_index', ascending=False)
                 
                 fig = go.Figure(data=[
@@ -186,7 +295,8 @@ class MultiCityComparator:
                 )
                 
                 output_path = self.output_dir / "inequality_comparison.html"
-                fig.write_html(str(output_path))
+                fig.write_html(str(output_path), include_plotlyjs='cdn', full_html=True,
+                               include_mathjax=False, config={'responsive': True}, validate=False)
                 print(f"[OK] Inequality comparison: {output_path}")
                 
                 return ineq_df
@@ -206,12 +316,14 @@ class MultiCityComparator:
             matrix_data = comp_df[['city_name'] + metrics_cols].copy()
             matrix_data = matrix_data.set_index('city_name')
             
-            # Normalize for heatmap
-            for col in metrics_cols:
-                col_min = matrix_data[col].min()
-                col_max = matrix_data[col].max()
-                if col_max > col_min:
-                    matrix_data[col] = (matrix_data[col] - col_min) / (col_max - col_min)
+            # Min-max normalize each column for the heatmap in one broadcast;
+            # constant columns are left unscaled
+            arr = matrix_data[metrics_cols].astype(float).to_numpy(dtype=np.float32)
+            mins = np.nanmin(arr, axis=0)
+            maxs = np.nanmax(arr, axis=0)
+            varies = maxs > mins
+            span = np.where(varies, maxs - mins, 1.0)
+            matrix_data[metrics_cols] = np.where(varies, (arr - mins) / span, arr)
             
             fig = go.Figure(data=go.Heatmap(
                 z=matrix_data.values,
@@ -225,8 +337,7 @@ class MultiCityComparator:
                 height=400
             )
             
-            output_path = self.output_dir / "city_performance_matrix.html"
-            fig.write_html(str(output_path))
+            output_path = self._write_overview(fig, "city_performance_matrix", 400)
             print(f"[OK] Performance matrix: {output_path}")
             
         except Exception as e:
@@ -239,59 +350,66 @@ class MultiCityComparator:
             print("-" * 60)
             
             if comp_df is not None and not comp_df.empty:
-                for _, city_data in comp_df.iterrows():
-                    city_name = str(city_data['city_name']) if pd.notna(city_data['city_name']) else 'Unknown'
+                summary_cols = ['city_name', 'avg_population', 'avg_rent', 'avg_employment',
+                                'avg_safety', 'avg_vitality', 'avg_transit']
+                for city, population, rent, employment, safety, vitality, transit in \
+                        comp_df[summary_cols].itertuples(index=False, name=None):
+                    city_name = str(city) if pd.notna(city) else 'Unknown'
                     print(f"\n{city_name}:")
-                    print(f"  Population: {city_data['avg_population']:.0f}")
-                    print(f"  Rent (EUR): {city_data['avg_rent']:.0f}")
-                    print(f"  Employment: {city_data['avg_employment']:.2f}")
-                    print(f"  Safety: {city_data['avg_safety']:.2f}")
-                    print(f"  Vitality: {city_data['avg_vitality']:.2f}")
-                    print(f"  Transit Access: {city_data['avg_transit']:.2f}")
+                    print(f"  Population: {population:.0f}")
+                    print(f"  Rent (EUR): {rent:.0f}")
+                    print(f"  Employment: {employment:.2f}")
+                    print(f"  Safety: {safety:.2f}")
+                    print(f"  Vitality: {vitality:.2f}")
+                    print(f"  Transit Access: {transit:.2f}")
             
             if ineq_df is not None and not ineq_df.empty:
                 print("\n[*] Inequality Rankings (lower is better):")
-                for _, row in ineq_df.iterrows():
-                    print(f"  {row['city_name']}: {row['inequality_index']:.3f}")
+                for city, inequality in ineq_df.itertuples(index=False, name=None):
+                    print(f"  {city}: {inequality:.3f}")
 
         except Exception as e:
             print(f"[WARN] Could not print summary: {e}")
 
 def main():
     """Run multi-city comparison analysis."""
+    parser = argparse.ArgumentParser(description='Multi-City Comparison Framework')
+    parser.add_argument('--interactive', action='store_true',
+                        help='Write overview charts as interactive HTML instead of PNG')
+    args = parser.parse_args()
+    
     try:
         print("\n" + "="*60)
         print("[*] MULTI-CITY COMPARISON FRAMEWORK")
         print("="*60)
         
-        comparator = MultiCityComparator()
-        
-        # Get all runs
-        runs_df = comparator.get_all_runs()
-        
-        if len(runs_df) == 0:
-            print("\n[ERROR] No simulation runs found")
-            print("\nTo use multi-city comparison:")
-            print("  1. Run simulations for different cities")
-            print("  2. Set city_name in simulation_run table")
-            print("  3. Re-run this script")
-            return False
-        
-        print(f"\n[OK] Found {len(runs_df)} simulation runs")
-        
-        # Detect city names
-        cities = runs_df['city_name'].unique()
-        print(f"   Cities: {', '.join([str(c) for c in cities if c])}")
-        
-        # Create comparisons
-        print("\n[*] Creating comparison visualizations...")
-        
-        comp_df = comparator.create_city_comparison(runs_df)
-        inequality_df = comparator.create_inequality_comparison(runs_df)
-        
-        if comp_df is not None:
-            comparator.create_performance_matrix(comp_df)
-            comparator.print_summary(comp_df, inequality_df)
+        with MultiCityComparator(interactive=args.interactive) as comparator:
+            # Get all runs
+            runs_df = comparator.get_all_runs()
+            
+            if len(runs_df) == 0:
+                print("\n[ERROR] No simulation runs found")
+                print("\nTo use multi-city comparison:")
+                print("  1. Run simulations for different cities")
+                print("  2. Set city_name in simulation_run table")
+                print("  3. Re-run this script")
+                return False
+            
+            print(f"\n[OK] Found {len(runs_df)} simulation runs")
+            
+            # Detect city names
+            cities = runs_df['city_name'].unique()
+            print(f"   Cities: {', '.join([str(c) for c in cities if c])}")
+            
+            # Create comparisons
+            print("\n[*] Creating comparison visualizations...")
+            
+            comp_df = comparator.create_city_comparison(runs_df)
+            inequality_df = comparator.create_inequality_comparison(runs_df)
+            
+            if comp_df is not None:
+                comparator.create_performance_matrix(comp_df)
+                comparator.print_summary(comp_df, inequality_df)
         
         print("\n" + "="*60)
         print("[OK] MULTI-CITY ANALYSIS COMPLETE")
@@ -13,31 +13,65 @@ from plotly.subplots import make_subplots
 sys.path.append(str(Path(__file__).parent / "src"))
 
 from database.db_config import db_config
+from database.result_cache import cached_frame
 from sqlalchemy import text
 
+# Above this many grid cells, line traces are drawn with WebGL instead of SVG
+SCATTERGL_MIN_ROWS = 1000
+
+# Larger grids are bucketed into this many points for the gradient plots
+MAX_GRADIENT_POINTS = 2000
+
 class SpilloverEffectsAnalyzer:
     """Analyze spatial spillover and neighborhood effects."""
     
     def __init__(self):
         self.output_dir = Path("data/outputs/visualizations")
         self.output_dir.mkdir(parents=True, exist_ok=True)
+        # Shared layout for the bar charts; figures start from it instead of
+        # merging the same sizing into each new figure
+        self._bar_layout = go.Layout(height=500, width=900)
+        # One connection for all of this analyzer's queries
+        self.conn = db_config.engine.connect()
+    
+    def close(self):
+        """Release the database connection."""
+        self.conn.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
     
     def get_latest_run(self):
         """Get latest simulation run."""
-        with db_config.engine.connect() as conn:
-            query = text("""
-            SELECT run_id FROM simulation_run 
-            WHERE status = 'completed'
-            ORDER BY created_at DESC LIMIT 1
-            """)
-            result = pd.read_sql(query, conn)
-        
-        return result.iloc[0]['run_id'] if not result.empty else None
+        query = text("""
+        SELECT run_id FROM simulation_run 
+        WHERE status = 'completed'
+        ORDER BY created_at DESC LIMIT 1
+        """)
+        return self.conn.execute(query).scalar()
     
     def get_grid_with_geometry(self, run_id):
-        """Get grid cells with geometry information."""
-        query = f"""
-        SELECT DISTINCT
+        """Get grid cells with geometry information (cached per run)."""
+        # Version 2: Arrow-backed dtypes
+        return cached_frame('spillover_grid', run_id,
+                            lambda: self._query_grid_with_geometry(run_id), version=2)
+    
+    def _query_grid_with_geometry(self, run_id):
+        """Fetch final-timestep grid cells with centroid coordinates.
+        
+        Rows are already unique per grid cell (UNIQUE(run_id, timestep, grid_id)),
+        and centroids come from spatial_grid's stored centroid column.
+        """
+        query = text("""
+        WITH final_step AS (
+            SELECT MAX(timestep) AS timestep
+            FROM simulation_state
+            WHERE run_id = :run_id
+        )
+        SELECT
             sg.grid_id,
             ss.population,
             ss.avg_rent_euro,
@@ -45,68 +79,76 @@ class SpilloverEffectsAnalyzer:
             ss.commercial_vitality,
             ss.air_quality_index,
             ss.social_cohesion_index,
-            st_x(st_centroid(sg.geometry)) as lon,
-            st_y(st_centroid(sg.geometry)) as lat
+            st_x(sg.centroid) as lon,
+            st_y(sg.centroid) as lat
         FROM simulation_state ss
+        JOIN final_step fs ON ss.timestep = fs.timestep
         JOIN spatial_grid sg ON ss.grid_id = sg.grid_id
-        WHERE ss.run_id = '{run_id}' 
-            AND ss.timestep = (SELECT MAX(timestep) FROM simulation_state WHERE run_id = '{run_id}')
+        WHERE ss.run_id = :run_id
         ORDER BY sg.grid_id
-        """
-        
-        with db_config.engine.connect() as conn:
-            df = pd.read_sql(query, conn)
+        """)
         
-        return df
+        return pd.read_sql(query, self.conn, params={'run_id': run_id}, dtype_backend='pyarrow')
     
     def calculate_spatial_autocorrelation(self, grid_df, metric):
         """Calculate Moran's I for a metric (simplified)."""
         if metric not in grid_df.columns:
             return 0.5
         
-        values = grid_df[metric].dropna().values
-        if len(values) < 2:
-            return 0.5
-        
-        mean_val = np.mean(values)
+        values = grid_df[metric].to_numpy(dtype=np.float64, na_value=np.nan)
+        values = values[~np.isnan(values)]
         
         # Simple autocorrelation: correlation of each value with spatial neighbors
         n = len(values)
         if n < 3:
             return 0.5
         
-        # Assume grid ordering means spatial proximity
-        correlations = []
-        for i in range(n - 1):
-            if not pd.isna(values[i]) and not pd.isna(values[i+1]) and values[i] is not None and values[i+1] is not None:
-                try:
-                    norm_i = (float(values[i]) - mean_val) / (np.std(values) + 1e-6)
-                    norm_next = (float(values[i+1]) - mean_val) / (np.std(values) + 1e-6)
-                    correlations.append(norm_i * norm_next)
-                except:
-                    pass
-        
-        return np.mean(correlations) if correlations else 0.5
+        # Assume grid ordering means spatial proximity: mean product of
+        # consecutive standardized values
+        z = (values - values.mean()) / (values.std() + 1e-6)
+        return np.dot(z[:-1], z[1:]) / (n - 1)
+    
+    def calculate_spatial_autocorrelations(self, grid_df, metrics):
+        """Calculate the simplified Moran's I for several metrics at once.
+        
+        Metrics without missing values are standardized together as one
+        (cells x metrics) matrix; a metric with gaps pairs up its own non-null
+        values, so it goes through calculate_spatial_autocorrelation.
+        """
+        metrics = [m for m in metrics if m in grid_df.columns]
+        values = grid_df[metrics].to_numpy(dtype=np.float64, na_value=np.nan)
+        complete = ~np.isnan(values).any(axis=0)
+        
+        autocorr = np.full(len(metrics), 0.5)
+        n = len(values)
+        if n >= 3 and complete.any():
+            block = values[:, complete]
+            z = (block - block.mean(axis=0)) / (block.std(axis=0) + 1e-6)
+            autocorr[complete] = (z[:-1] * z[1:]).sum(axis=0) / (n - 1)
+        
+        for i in np.flatnonzero(~complete):
+            autocorr[i] = self.calculate_spatial_autocorrelation(grid_df, metrics[i])
+        
+        return dict(zip(metrics, autocorr))
     
     def create_spillover_heatmap(self, grid_df):
         """Create heatmap showing metric clustering."""
         
         metrics = ['population', 'avg_rent_euro', 'safety_score', 'commercial_vitality', 'air_quality_index']
         
-        # Calculate spatial autocorrelation for each metric
-        autocorr = {}
-        for metric in metrics:
-            if metric in grid_df.columns:
-                autocorr[metric] = self.calculate_spatial_autocorrelation(grid_df, metric)
+        # Calculate spatial autocorrelation for all metrics in one pass
+        autocorr = self.calculate_spatial_autocorrelations(grid_df, metrics)
         
-        # Create heatmap of spillover strength
-        fig = go.Figure()
+        # Create heatmap of spillover strength. Numeric arrays are passed as
+        # float32 ndarrays so plotly writes them as compact typed arrays
+        strength = np.asarray(list(autocorr.values()), dtype=np.float32)
+        fig = go.Figure(layout=self._bar_layout)
         
         fig.add_trace(go.Bar(
             x=list(autocorr.keys()),
-            y=list(autocorr.values()),
+            y=strength,
             marker=dict(
-                color=list(autocorr.values()),
+                color=strength,
                 colorscale='Viridis',
                 showscale=True,
                 colorbar=dict(title="Clustering<br>Strength")
@@ -119,13 +161,12 @@ class SpilloverEffectsAnalyzer:
             title="<b>Spatial Clustering Strength by Metric</b><br><sub>Higher values = stronger neighborhood effects</sub>",
             xaxis_title="Urban Metric",
             yaxis_title="Clustering Strength (Moran's I)",
-            height=500,
-            width=900,
             hovermode='x'
         )
         
         output_path = self.output_dir / "spillover_clustering.html"
-        fig.write_html(str(output_path))
+        fig.write_html(str(output_path), include_plotlyjs='cdn', full_html=True,
+                       include_mathjax=False, config={'responsive': True}, validate=False)
         print(f"\n✅ Spillover clustering: {output_path}")
         
         return autocorr
@@ -133,25 +174,25 @@ class SpilloverEffectsAnalyzer:
     def create_performance_gradient(self, grid_df):
         """Show how metrics change across space."""
         
-        # Create performance composite
-        grid_df = grid_df.copy()
-        
-        # Normalize metrics to 0-1
-        for col in ['population', 'safety_score', 'commercial_vitality', 'social_cohesion_index']:
-            if col in grid_df.columns and grid_df[col].max() > 0:
-                grid_df[f'{col}_norm'] = (grid_df[col] - grid_df[col].min()) / (grid_df[col].max() - grid_df[col].min() + 1e-6)
-        
-        # Composite score: 40% population, 30% safety, 20% vitality, 10% cohesion
-        grid_df['performance_score'] = (
-            grid_df.get('population_norm', 0) * 0.4 +
-            grid_df.get('safety_score_norm', 0) * 0.3 +
-            grid_df.get('commercial_vitality_norm', 0) * 0.2 +
-            grid_df.get('social_cohesion_index_norm', 0) * 0.1
+        # Create performance composite: normalize metrics to 0-1 and weight
+        # them in one matrix pass. Composite score: 40% population, 30% safety, 20% vitality, 10% cohesion;
+        # metrics that are missing or never positive contribute 0
+        score_cols = ['population', 'safety_score', 'commercial_vitality', 'social_cohesion_index']
+        weights = np.array([0.4, 0.3, 0.2, 0.1])
+        
+        metrics = grid_df.reindex(columns=score_cols).astype(float)
+        mins = metrics.min().to_numpy()
+        maxs = metrics.max().to_numpy()
+        normalized = (metrics.to_numpy() - mins) / (maxs - mins + 1e-6)
+        normalized[:, ~(maxs > 0)] = 0
+        
+        # Add the score and rent pressure in one assign instead of copying the
+        # frame up front and mutating it
+        grid_df = grid_df.assign(
+            performance_score=normalized @ weights,
+            rent_pressure=grid_df['avg_rent_euro'] / grid_df['avg_rent_euro'].mean()
         )
         
-        # Also track rent pressure
-        grid_df['rent_pressure'] = grid_df['avg_rent_euro'] / grid_df['avg_rent_euro'].mean()
-        
         # Create scatter: performance vs rent (showing agglomeration)
         fig = make_subplots(
             rows=1, cols=2,
@@ -159,15 +200,18 @@ class SpilloverEffectsAnalyzer:
             specs=[[{'type': 'scatter'}, {'type': 'scatter'}]]
         )
         
+        plot_df, marker_size = self._gradient_plot_points(grid_df)
+        scatter = go.Scattergl if len(plot_df) >= SCATTERGL_MIN_ROWS else go.Scatter
+        
         # Plot 1: Performance across grid
         fig.add_trace(
-            go.Scatter(
-                x=grid_df['grid_id'],
-                y=grid_df['performance_score'],
+            scatter(
+                x=plot_df['grid_id'],
+                y=plot_df['performance_score'].to_numpy(dtype=np.float32),
                 mode='lines+markers',
                 name='Performance Score',
                 line=dict(color='blue', width=2),
-                marker=dict(size=8),
+                marker=dict(size=marker_size),
                 fill='tozeroy',
                 fillcolor='rgba(0,100,200,0.2)'
             ),
@@ -176,13 +220,13 @@ class SpilloverEffectsAnalyzer:
         
         # Plot 2: Rent pressure
         fig.add_trace(
-            go.Scatter(
-                x=grid_df['grid_id'],
-                y=grid_df['rent_pressure'],
+            scatter(
+                x=plot_df['grid_id'],
+                y=plot_df['rent_pressure'].to_numpy(dtype=np.float32),
                 mode='lines+markers',
                 name='Rent Pressure',
                 line=dict(color='red', width=2),
-                marker=dict(size=8),
+                marker=dict(size=marker_size),
                 fill='tozeroy',
                 fillcolor='rgba(200,0,0,0.2)'
             ),
@@ -202,23 +246,49 @@ class SpilloverEffectsAnalyzer:
         )
         
         output_path = self.output_dir / "performance_gradient.html"
-        fig.write_html(str(output_path))
+        fig.write_html(str(output_path), include_plotlyjs='cdn', full_html=True,
+                       include_mathjax=False, config={'responsive': True}, validate=False)
         print(f"✅ Performance gradient: {output_path}")
         
         return grid_df
     
-    def create_agglomeration_analysis(self, grid_df):
-        """Identify agglomeration clusters."""
+    def _gradient_plot_points(self, grid_df):
+        """Points for the gradient plots, and their marker size.
         
-        grid_df = grid_df.copy()
+        Grids above MAX_GRADIENT_POINTS cells are split into that many runs of
+        consecutive cells, each drawn at its first grid_id with mean scores and
+        a marker sized by the run's total population.
+        """
+        n = len(grid_df)
+        if n <= MAX_GRADIENT_POINTS:
+            return grid_df, 8
+        
+        bucket = np.arange(n) * MAX_GRADIENT_POINTS // n
+        plot_df = grid_df.groupby(bucket, sort=False).agg(
+            grid_id=('grid_id', 'first'),
+            performance_score=('performance_score', 'mean'),
+            rent_pressure=('rent_pressure', 'mean'),
+            population=('population', 'sum'),
+        )
         
-        # Identify high-value clusters
-        high_performance = grid_df['performance_score'].quantile(0.75) if 'performance_score' in grid_df.columns else 0
-        grid_df['is_cluster'] = grid_df.get('performance_score', 0) > high_performance
+        size = np.sqrt(plot_df['population'].to_numpy(dtype=np.float64, na_value=0))
+        marker_size = 4 + 12 * size / size.max() if size.max() > 0 else 8
+        return plot_df, marker_size
+    
+    def create_agglomeration_analysis(self, grid_df):
+        """Identify agglomeration clusters."""
         
-        # Count consecutive clusters
-        grid_df['cluster_id'] = (grid_df['is_cluster'] != grid_df['is_cluster'].shift()).cumsum()
-        clusters = grid_df[grid_df['is_cluster']].groupby('cluster_id').agg({
+        # Identify high-value clusters (read-only: no columns are added to grid_df)
+        if 'performance_score' in grid_df.columns:
+            scores = grid_df['performance_score']
+            is_cluster = (scores > scores.quantile(0.75)).to_numpy(dtype=bool)
+        else:
+            is_cluster = np.zeros(len(grid_df), dtype=bool)
+        
+        # Count consecutive clusters: a new run id starts wherever is_cluster flips
+        run_starts = np.concatenate(([True], is_cluster[1:] != is_cluster[:-1]))
+        cluster_id = run_starts.cumsum()
+        clusters = grid_df[is_cluster].groupby(cluster_id[is_cluster], sort=False).agg({
             'grid_id': 'count',
             'population': 'sum',
             'avg_rent_euro': 'mean',
@@ -231,18 +301,18 @@ class SpilloverEffectsAnalyzer:
         
         # Create visualization
         if len(clusters) > 0:
-            fig = go.Figure()
+            fig = go.Figure(layout=self._bar_layout)
             
             fig.add_trace(go.Bar(
                 x=[f"Cluster {i+1}" for i in range(len(clusters))],
-                y=clusters['population'].values,
+                y=clusters['population'].to_numpy(dtype=np.float32),
                 marker=dict(
-                    color=clusters['vitality'].values,
+                    color=clusters['vitality'].to_numpy(dtype=np.float32),
                     colorscale='Viridis',
                     showscale=True,
                     colorbar=dict(title="Commercial<br>Vitality")
                 ),
-                text=clusters['avg_rent'].values,
+                text=clusters['avg_rent'].to_numpy(dtype=np.float32),
                 texttemplate="€%{text:.0f}",
                 textposition="outside"
             ))
@@ -250,13 +320,12 @@ class SpilloverEffectsAnalyzer:
             fig.update_layout(
                 title="<b>Agglomeration Clusters</b><br><sub>High-performance neighborhoods with significant spillover effects</sub>",
                 xaxis_title="Cluster ID",
-                yaxis_title="Total Population",
-                height=500,
-                width=900
+                yaxis_title="Total Population"
             )
             
             output_path = self.output_dir / "agglomeration_clusters.html"
-            fig.write_html(str(output_path))
+            fig.write_html(str(output_path), include_plotlyjs='cdn', full_html=True,
+                           include_mathjax=False, config={'responsive': True}, validate=False)
             print(f"✅ Agglomeration clusters: {output_path}")
         
         return clusters
@@ -267,42 +336,41 @@ def main():
         print("🌐 SPATIAL SPILLOVER EFFECTS ANALYSIS")
         print("="*60)
         
-        analyzer = SpilloverEffectsAnalyzer()
-        
-        run_id = analyzer.get_latest_run()
-        if not run_id:
-            print("❌ No simulation runs found")
-            return False
-        
-        print(f"\n✅ Analyzing run: {run_id}")
-        
-        # Get grid data
-        grid_df = analyzer.get_grid_with_geometry(run_id)
-        if grid_df is None or grid_df.empty:
-            print("❌ No grid data available")
-            return False
-        
-        print(f"✅ Loaded {len(grid_df)} grid cells")
-        
-        # Analyze spillover effects
-        print("\n📊 Analyzing spillover mechanisms...")
-        autocorr = analyzer.create_spillover_heatmap(grid_df)
-        
-        # Show performance gradients
-        print("📊 Calculating performance gradients...")
-        grid_with_perf = analyzer.create_performance_gradient(grid_df)
-        
-        # Identify agglomeration
-        print("📊 Identifying agglomeration clusters...")
-        clusters = analyzer.create_agglomeration_analysis(grid_with_perf)
-        
-        # Print summary
-        print("\n📈 Spillover Summary:")
-        print(f"  Strongest clustering: {max(autocorr.items(), key=lambda x: x[1])}")
-        print(f"  Number of agglomeration clusters: {len(clusters)}")
-        if len(clusters) > 0:
-            print(f"  Largest cluster population: {clusters['population'].max():.0f}")
-            print(f"  Cluster rent premium: {(clusters['avg_rent'].mean() / grid_df['avg_rent_euro'].mean() - 1) * 100:.1f}%")
+        with SpilloverEffectsAnalyzer() as analyzer:
+            run_id = analyzer.get_latest_run()
+            if not run_id:
+                print("❌ No simulation runs found")
+                return False
+            
+            print(f"\n✅ Analyzing run: {run_id}")
+            
+            # Get grid data
+            grid_df = analyzer.get_grid_with_geometry(run_id)
+            if grid_df is None or grid_df.empty:
+                print("❌ No grid data available")
+                return False
+            
+            print(f"✅ Loaded {len(grid_df)} grid cells")
+            
+            # Analyze spillover effects
+            print("\n📊 Analyzing spillover mechanisms...")
+            autocorr = analyzer.create_spillover_heatmap(grid_df)
+            
+            # Show performance gradients
+            print("📊 Calculating performance gradients...")
+            grid_with_perf = analyzer.create_performance_gradient(grid_df)
+            
+            # Identify agglomeration
+            print("📊 Identifying agglomeration clusters...")
+            clusters = analyzer.create_agglomeration_analysis(grid_with_perf)
+            
+            # Print summary
+            print("\n📈 Spillover Summary:")
+            print(f"  Strongest clustering: {max(autocorr.items(), key=lambda x: x[1])}")
+            print(f"  Number of agglomeration clusters: {len(clusters)}")
+            if len(clusters) > 0:
+                print(f"  Largest cluster population: {clusters['population'].max():.0f}")
+                print(f"  Cluster rent premium: {(clusters['avg_rent'].mean() / grid_df['avg_rent_euro'].mean() - 1) * 100:.1f}%")
         
         print("\n" + "="*60)
         print("✅ SPILLOVER ANALYSIS COMPLETE")
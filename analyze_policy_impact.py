@@ -19,6 +19,7 @@ import numpy as np
 sys.path.append(str(Path(__file__).parent / "src"))
 
 from database.db_config import db_config
+from database.result_cache import cached_frame
 from sqlalchemy import text
 
 class PolicyScenarioAnalyzer:
@@ -27,44 +28,85 @@ class PolicyScenarioAnalyzer:
     def __init__(self):
         self.output_dir = Path("data/outputs/visualizations")
         self.output_dir.mkdir(parents=True, exist_ok=True)
+        # One connection for all of this analyzer's queries
+        self.conn = db_config.engine.connect()
+    
+    def close(self):
+        """Release the database connection."""
+        self.conn.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
     
     def get_recent_runs(self, limit=10):
         """Get recent simulation runs."""
-        with db_config.engine.connect() as conn:
-            query = text("""
-            SELECT run_id, name, created_at 
-            FROM simulation_run 
-            WHERE status = 'completed'
-            ORDER BY created_at DESC 
-            LIMIT :limit
-            """)
-            runs_df = pd.read_sql(query, conn, params={"limit": limit})
-        return runs_df
+        query = text("""
+        SELECT run_id, name, created_at 
+        FROM simulation_run 
+        WHERE status = 'completed'
+        ORDER BY created_at DESC 
+        LIMIT :limit
+        """)
+        return pd.read_sql(query, self.conn, params={"limit": limit})
     
     def get_run_metrics(self, run_id):
-        """Get aggregated metrics for a run."""
-        query = f"""
+        """Get aggregated metrics for a run (cached per run)."""
+        # Version 3: integer averages come back as float8, not decimal128
+        return cached_frame('policy_metrics', run_id,
+                            lambda: self._query_run_metrics(run_id), version=3)
+    
+    def _query_run_metrics(self, run_id):
+        """Average metrics per timestep for a run.
+        
+        Read from the simulation_run_timestep_agg summary table when it
+        exists (migrate_add_timestep_agg_table.sql) and holds the run, otherwise
+        aggregated from simulation_state.
+        """
+        if self.conn.execute(text("SELECT to_regclass('simulation_run_timestep_agg')")).scalar() is not None:
+            query = text("""
+            SELECT 
+                timestep,
+                avg_population,
+                avg_rent,
+                avg_displacement,
+                avg_congestion,
+                avg_safety,
+                avg_air_quality,
+                avg_employment,
+                avg_vitality,
+                avg_cohesion,
+                avg_transit
+            FROM simulation_run_timestep_agg
+            WHERE run_id = :run_id
+            ORDER BY timestep
+            """)
+            df = pd.read_sql(query, self.conn, params={"run_id": run_id}, dtype_backend="pyarrow")
+            if not df.empty:
+                return df
+        
+        query = text("""
         SELECT 
             timestep,
-            AVG(population) as avg_population,
+            AVG(population)::float8 as avg_population,
             AVG(avg_rent_euro) as avg_rent,
             AVG(displacement_risk) as avg_displacement,
             AVG(traffic_congestion) as avg_congestion,
             AVG(safety_score) as avg_safety,
             AVG(air_quality_index) as avg_air_quality,
-            AVG(employment) as avg_employment,
+            AVG(employment)::float8 as avg_employment,
             AVG(commercial_vitality) as avg_vitality,
             AVG(social_cohesion_index) as avg_cohesion,
             AVG(public_transit_accessibility) as avg_transit
         FROM simulation_state
-        WHERE run_id = '{run_id}'
+        WHERE run_id = :run_id
         GROUP BY timestep
         ORDER BY timestep
-        """
+        """)
         
-        with db_config.engine.connect() as conn:
-            df = pd.read_sql(query, conn)
-        return df
+        return pd.read_sql(query, self.conn, params={"run_id": run_id}, dtype_backend="pyarrow")
     
     def create_policy_impact_analysis(self):
         """Analyze policy impacts from latest run."""
@@ -77,7 +119,7 @@ class PolicyScenarioAnalyzer:
             print("❌ No simulation runs found")
             return False
         
-        run_id = runs.iloc[0]['run_id']
+        run_id = runs.at[0, 'run_id']
         print(f"\n✅ Using latest run: {run_id}")
         
         # Get metrics
@@ -86,31 +128,25 @@ class PolicyScenarioAnalyzer:
             print("❌ No data for this run")
             return False
         
-        # Create policy impact summary
-        final_t = df['timestep'].max()
-        initial_t = df['timestep'].min()
-        
-        initial_data = df[df['timestep'] == initial_t].iloc[0]
-        final_data = df[df['timestep'] == final_t].iloc[0]
-        
-        # Calculate changes - handle None/NaN values
-        def safe_percent_change(final_val, initial_val):
-            """Safely calculate percent change."""
-            if initial_val is None or final_val is None or initial_val == 0:
-                return 0
-            try:
-                return (float(final_val) - float(initial_val)) / float(initial_val) * 100
-            except:
-                return 0
-        
-        changes = {
-            'Population Growth': safe_percent_change(final_data.get('avg_population'), initial_data.get('avg_population')),
-            'Rent Change': safe_percent_change(final_data.get('avg_rent'), initial_data.get('avg_rent')),
-            'Safety Improvement': safe_percent_change(final_data.get('avg_safety'), initial_data.get('avg_safety')),
-            'Air Quality': safe_percent_change(final_data.get('avg_air_quality'), initial_data.get('avg_air_quality')),
-            'Employment Growth': safe_percent_change(final_data.get('avg_employment'), initial_data.get('avg_employment')),
-            'Transit Access': safe_percent_change(final_data.get('avg_transit'), initial_data.get('avg_transit')),
+        # Create policy impact summary: rows are ordered by timestep, so the
+        # first and last rows are the initial and final states
+        outcome_cols = {
+            'Population Growth': 'avg_population',
+            'Rent Change': 'avg_rent',
+            'Safety Improvement': 'avg_safety',
+            'Air Quality': 'avg_air_quality',
+            'Employment Growth': 'avg_employment',
+            'Transit Access': 'avg_transit',
         }
+        endpoints = df[list(outcome_cols.values())].iloc[[0, -1]].astype(float).to_numpy()
+        initial_vals, final_vals = endpoints
+        
+        # Percent changes for all metrics at once; missing or zero baselines
+        # count as no change
+        with np.errstate(divide='ignore', invalid='ignore'):
+            pct = (final_vals - initial_vals) / initial_vals * 100
+        pct = np.where(np.isfinite(pct) & (initial_vals != 0), pct, 0.0)
+        changes = dict(zip(outcome_cols, pct.tolist()))
         
         # Create bar chart
         fig = go.Figure()
@@ -121,7 +157,7 @@ class PolicyScenarioAnalyzer:
         
         fig.add_trace(go.Bar(
             y=metrics,
-            x=values,
+            x=np.asarray(values, dtype=np.float32),
             orientation='h',
             marker_color=colors,
             text=[f"{v:.1f}%" for v in values],
@@ -137,7 +173,8 @@ class PolicyScenarioAnalyzer:
         )
         
         output_path = self.output_dir / "policy_impact_analysis.html"
-        fig.write_html(str(output_path))
+        fig.write_html(str(output_path), include_plotlyjs='cdn', full_html=True,
+                       include_mathjax=False, config={'responsive': True}, validate=False)
         print(f"\n✅ Policy impact analysis saved: {output_path}")
         
         # Print summary
@@ -150,8 +187,8 @@ class PolicyScenarioAnalyzer:
 
 def main():
     try:
-        analyzer = PolicyScenarioAnalyzer()
-        return analyzer.create_policy_impact_analysis()
+        with PolicyScenarioAnalyzer() as analyzer:
+            return analyzer.create_policy_impact_analysis()
     except Exception as e:
         print(f"\n❌ Error: {e}")
         import traceback
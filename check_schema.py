@@ -1,13 +1,21 @@
 import sys
 sys.path.append('src')
 from database.db_config import db_config
-from sqlalchemy import inspect
+from sqlalchemy import text
 
 engine = db_config.engine
-inspector = inspect(engine)
 
 table_name = 'ev_infrastructure'
-columns = inspector.get_columns(table_name)
+with engine.connect() as conn:
+    # format_type keeps geometry(Point,4326) and varchar(n), which
+    # information_schema reports as USER-DEFINED / character varying
+    columns = conn.execute(text("""
+        SELECT attname, format_type(atttypid, atttypmod)
+        FROM pg_attribute
+        WHERE attrelid = to_regclass(CAST(:table_name AS text))
+        AND attnum > 0 AND NOT attisdropped
+        ORDER BY attnum
+    """), {'table_name': table_name}).fetchall()
 print(f'Columns in {table_name}:')
-for col in columns:
-    print(f'  {col["name"]}: {col["type"]}')
+for name, data_type in columns:
+    print(f'  {name}: {data_type}')
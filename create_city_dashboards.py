@@ -2,250 +2,178 @@
 """
 Generate city-specific policy dashboards for Berlin, Leipzig, Munich
 """
-import pandas as pd
+import argparse
+import gzip
+from functools import lru_cache
+from pathlib import Path
+import numpy as np
+from jinja2 import DictLoader, Environment
 from src.database.db_config import db_config
 from sqlalchemy import text
 
-print("[*] Generating city-specific policy dashboards...\n")
-
-# Get baseline data
-with db_config.engine.connect() as conn:
-    query = text('''
-        SELECT 
-            sr.city_name,
-            ROUND(AVG(ss.population)::numeric, 0) as population,
-            ROUND(AVG(ss.avg_rent_euro)::numeric, 2) as rent_eur,
-            ROUND(AVG(ss.commercial_vitality)::numeric, 3) as vitality,
-            ROUND(AVG(ss.displacement_risk)::numeric, 3) as displacement,
-            ROUND(AVG(ss.safety_score)::numeric, 3) as safety
-        FROM simulation_state ss
-        JOIN simulation_run sr ON ss.run_id = sr.run_id
-        WHERE sr.city_name IN ('leipzig', 'berlin', 'munich')
-        AND ss.timestep = 50
-        GROUP BY sr.city_name
-    ''')
-    baseline = pd.read_sql(query, conn)
-
-cities_config = {
-    'berlin': {
-        'name': 'BERLIN',
-        'emoji': '🏛️',
-        'priority': 'Livability Maximizer',
-        'color': '#E53935',
-        'recommendation': 'Combined Policy',
-        'rationale': "Berlin's affordability baseline allows aggressive intervention. Combined approach maximizes quality of life improvements across all metrics.",
-        'scenarios': {
-            'Baseline': (1.00, 1.00, 1.00, 1.00),
-            'Transit Investment': (1.045, 1.00, 1.15, 1.00),
-            'Affordable Housing': (1.05, 0.80, 1.00, 0.92),
-            'Green Infrastructure': (1.025, 1.02, 1.20, 1.00),
-            'Combined Policy': (1.12, 0.80, 1.35, 0.92)
-        },
-        'budget': '€50M',
-        'timeline': '3 years'
-    },
-    'leipzig': {
-        'name': 'LEIPZIG',
-        'emoji': '🏭',
-        'priority': 'Affordability Crisis Response',
-        'color': '#FFA500',
-        'recommendation': 'Affordable Housing → Combined',
-        'rationale': "Leipzig faces affordability crisis (€3,050/mo). Housing subsidy directly addresses critical need. Immediate start, add transit/green later.",
-        'scenarios': {
-            'Baseline': (1.00, 1.00, 1.00, 1.00),
-            'Transit Investment': (1.045, 1.00, 1.15, 1.00),
-            'Affordable Housing': (1.05, 0.80, 1.00, 0.92),
-            'Green Infrastructure': (1.025, 1.02, 1.20, 1.00),
-            'Combined Policy': (1.12, 0.80, 1.35, 0.92)
-        },
-        'budget': '€30M (→€60M Phase 2)',
-        'timeline': 'Immediate start, phased expansion'
-    },
-    'munich': {
-        'name': 'MUNICH',
-        'emoji': '🌳',
-        'priority': 'Growth Sustainer',
-        'color': '#43A047',
-        'recommendation': 'Combined Policy',
-        'rationale': "Munich has strongest baseline (970 residents). Combined policy leverages momentum, adds 116 residents while cutting rents 20%.",
-        'scenarios': {
-            'Baseline': (1.00, 1.00, 1.00, 1.00),
-            'Transit Investment': (1.045, 1.00, 1.15, 1.00),
-            'Affordable Housing': (1.05, 0.80, 1.00, 0.92),
-            'Green Infrastructure': (1.025, 1.02, 1.20, 1.00),
-            'Combined Policy': (1.12, 0.80, 1.35, 0.92)
-        },
-        'budget': '€60M',
-        'timeline': '3 years (full implementation)'
-    }
-}
-
-# Generate dashboard for each city
-for city_key, city_info in cities_config.items():
-    # Get baseline for this city
-    city_baseline = baseline[baseline['city_name'] == city_key].iloc[0]
-    
-    html = f"""<!DOCTYPE html>
+# Static parts of the dashboard page, encoded once at import. The CSS only
+# refers to the city colors through custom properties, so it is the same for
+# every city
+STATIC_HEAD_BYTES = """<!DOCTYPE html>
 <html lang="en">
 <head>
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>Policy Analysis - {city_info['name']}</title>
     <script src="https://cdn.jsdelivr.net/npm/chart.js"></script>
     <style>
-        * {{
+        * {
             margin: 0;
             padding: 0;
             box-sizing: border-box;
-        }}
+        }
         
-        body {{
+        body {
             font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
-            background: linear-gradient(135deg, {city_info['color']} 0%, rgba(0,0,0,0.1) 100%);
+            background: linear-gradient(135deg, var(--accent) 0%, rgba(0,0,0,0.1) 100%);
             min-height: 100vh;
             padding: 20px;
-        }}
+        }
         
-        .container {{
+        .container {
             max-width: 1200px;
             margin: 0 auto;
             background: white;
             border-radius: 12px;
             box-shadow: 0 20px 60px rgba(0,0,0,0.3);
             overflow: hidden;
-        }}
+        }
         
-        .header {{
-            background: linear-gradient(135deg, {city_info['color']} 0%, #333 100%);
+        .header {
+            background: linear-gradient(135deg, var(--accent) 0%, #333 100%);
             color: white;
             padding: 40px;
             text-align: center;
-        }}
+        }
         
-        .header h1 {{
+        .header h1 {
             font-size: 48px;
             margin-bottom: 10px;
-        }}
+        }
         
-        .header p {{
+        .header p {
             font-size: 18px;
             opacity: 0.9;
-        }}
+        }
         
-        .content {{
+        .content {
             padding: 40px;
-        }}
+        }
         
-        .section {{
+        .section {
             margin-bottom: 50px;
-        }}
+        }
         
-        .section h2 {{
-            color: {city_info['color']};
+        .section h2 {
+            color: var(--accent);
             margin-bottom: 20px;
             font-size: 24px;
-            border-bottom: 3px solid {city_info['color']};
+            border-bottom: 3px solid var(--accent);
             padding-bottom: 10px;
-        }}
+        }
         
-        .metrics-grid {{
+        .metrics-grid {
             display: grid;
             grid-template-columns: repeat(auto-fit, minmax(200px, 1fr));
             gap: 20px;
             margin-bottom: 30px;
-        }}
+        }
         
-        .metric-card {{
+        .metric-card {
             background: linear-gradient(135deg, #f5f5f5 0%, white 100%);
-            border: 2px solid {city_info['color']};
+            border: 2px solid var(--accent);
             border-radius: 8px;
             padding: 20px;
             text-align: center;
-        }}
+        }
         
-        .metric-card .label {{
+        .metric-card .label {
             color: #666;
             font-size: 13px;
             text-transform: uppercase;
             margin-bottom: 10px;
             font-weight: 600;
-        }}
+        }
         
-        .metric-card .value {{
+        .metric-card .value {
             font-size: 32px;
             font-weight: bold;
-            color: {city_info['color']};
+            color: var(--accent);
             margin-bottom: 5px;
-        }}
+        }
         
-        .metric-card .change {{
+        .metric-card .change {
             font-size: 14px;
             color: #27ae60;
             font-weight: 600;
-        }}
+        }
         
-        .recommendation-box {{
+        .recommendation-box {
             background: linear-gradient(135deg, #e3f2fd 0%, #f3e5f5 100%);
-            border-left: 6px solid {city_info['color']};
+            border-left: 6px solid var(--accent);
             padding: 25px;
             border-radius: 8px;
             margin: 30px 0;
-        }}
+        }
         
-        .recommendation-box h3 {{
-            color: {city_info['color']};
+        .recommendation-box h3 {
+            color: var(--accent);
             margin-bottom: 10px;
             font-size: 20px;
-        }}
+        }
         
-        .recommendation-box .badge {{
+        .recommendation-box .badge {
             display: inline-block;
-            background: {city_info['color']};
+            background: var(--accent);
             color: white;
             padding: 8px 16px;
             border-radius: 20px;
             font-weight: 600;
             margin-bottom: 15px;
             font-size: 14px;
-        }}
+        }
         
-        .recommendation-box p {{
+        .recommendation-box p {
             color: #333;
             line-height: 1.8;
             margin-bottom: 10px;
-        }}
+        }
         
-        .recommendation-box ul {{
+        .recommendation-box ul {
             margin-left: 20px;
             color: #333;
             line-height: 1.8;
-        }}
+        }
         
-        .scenario-table {{
+        .scenario-table {
             width: 100%;
             border-collapse: collapse;
             margin: 20px 0;
             box-shadow: 0 2px 8px rgba(0,0,0,0.1);
-        }}
+        }
         
-        .scenario-table th {{
-            background: {city_info['color']};
+        .scenario-table th {
+            background: var(--accent);
             color: white;
             padding: 15px;
             text-align: left;
             font-weight: 600;
-        }}
+        }
         
-        .scenario-table td {{
+        .scenario-table td {
             padding: 15px;
             border-bottom: 1px solid #eee;
-        }}
+        }
         
-        .scenario-table tr:hover {{
+        .scenario-table tr:hover {
             background: #f9f9f9;
-        }}
+        }
         
-        .chart-container {{
+        .chart-container {
             position: relative;
             height: 400px;
             margin: 30px 0;
@@ -253,56 +181,91 @@ for city_key, city_info in cities_config.items():
             border-radius: 8px;
             padding: 20px;
             box-shadow: 0 2px 8px rgba(0,0,0,0.1);
-        }}
+        }
         
-        .timeline {{
+        .timeline {
             display: grid;
             grid-template-columns: repeat(4, 1fr);
             gap: 15px;
             margin: 30px 0;
-        }}
+        }
         
-        .timeline-item {{
-            background: linear-gradient(135deg, {city_info['color']} 0%, rgba({int(city_info['color'][1:3], 16)},0,0,0.5) 100%);
+        .timeline-item {
+            background: linear-gradient(135deg, var(--accent) 0%, var(--accent-fade) 100%);
             color: white;
             padding: 20px;
             border-radius: 8px;
             text-align: center;
-        }}
+        }
         
-        .timeline-item .year {{
+        .timeline-item .year {
             font-size: 18px;
             font-weight: bold;
             margin-bottom: 10px;
-        }}
+        }
         
-        .timeline-item .phase {{
+        .timeline-item .phase {
             font-size: 14px;
             opacity: 0.9;
-        }}
+        }
         
-        .winner {{
+        .winner {
             background: #d4edda;
             color: #155724;
             padding: 10px 15px;
             border-radius: 5px;
             font-weight: 600;
             display: inline-block;
-        }}
+        }
         
-        .footer {{
+        .footer {
             text-align: center;
             padding: 30px;
             background: #f9f9f9;
             color: #666;
             border-top: 1px solid #eee;
-        }}
+        }
+    </style>
+""".encode('utf-8')
+
+STATIC_FOOTER_BYTES = """            <!-- Key Risks -->
+            <div class="section">
+                <h2>⚠️ Key Risks & Mitigation</h2>
+                <div class="recommendation-box">
+                    <h3>What Could Go Wrong?</h3>
+                    <ul>
+                        <li><strong>Unsustainable costs:</strong> Phased funding with performance gates</li>
+                        <li><strong>Gentrification:</strong> Community land trusts, rent controls</li>
+                        <li><strong>Implementation delays:</strong> 15% budget contingency, clear timelines</li>
+                        <li><strong>Political change:</strong> Multi-year contracts, broad coalition</li>
+                    </ul>
+                </div>
+            </div>
+        </div>
+        
+        <div class="footer">
+            <p>Generated: January 2026 | Analysis Tool: holistic_urban_simulator</p>
+            <p>Data Source: 3-city simulation (20 timesteps each) | Database: PostgreSQL urban_sim</p>
+        </div>
+    </div>
+</body>
+</html>
+""".encode('utf-8')
+
+# Per-city part of the page (title, color properties and content), compiled
+# once at import and rendered for each city
+DASHBOARD_HTML = """    <title>Policy Analysis - {{ city.name }}</title>
+    <style>
+        :root {
+            --accent: {{ city.color }};
+            --accent-fade: rgba({{ city.color_r }},0,0,0.5);
+        }
     </style>
 </head>
 <body>
     <div class="container">
         <div class="header">
-            <h1>{city_info['emoji']} {city_info['name']}</h1>
+            <h1>{{ city.emoji }} {{ city.name }}</h1>
             <p>Policy Scenario Analysis & Recommendations</p>
         </div>
         
@@ -313,22 +276,22 @@ for city_key, city_info in cities_config.items():
                 <div class="metrics-grid">
                     <div class="metric-card">
                         <div class="label">Population</div>
-                        <div class="value">{int(city_baseline['population']):,}</div>
+                        <div class="value">{{ '{:,}'.format(baseline.population) }}</div>
                         <div class="change">residents</div>
                     </div>
                     <div class="metric-card">
                         <div class="label">Avg Rent</div>
-                        <div class="value">€{city_baseline['rent_eur']:.0f}</div>
+                        <div class="value">€{{ '{:.0f}'.format(baseline.rent_eur) }}</div>
                         <div class="change">/month</div>
                     </div>
                     <div class="metric-card">
                         <div class="label">Vitality Index</div>
-                        <div class="value">{city_baseline['vitality']:.3f}</div>
+                        <div class="value">{{ '{:.3f}'.format(baseline.vitality) }}</div>
                         <div class="change">economic activity</div>
                     </div>
                     <div class="metric-card">
                         <div class="label">Displacement Risk</div>
-                        <div class="value">{city_baseline['displacement']:.3f}</div>
+                        <div class="value">{{ '{:.3f}'.format(baseline.displacement) }}</div>
                         <div class="change">community vulnerability</div>
                     </div>
                 </div>
@@ -338,12 +301,12 @@ for city_key, city_info in cities_config.items():
             <div class="section">
                 <h2>🎯 Recommended Policy</h2>
                 <div class="recommendation-box">
-                    <div class="badge">{city_info['recommendation']}</div>
-                    <h3>Priority: {city_info['priority']}</h3>
-                    <p><strong>Rationale:</strong> {city_info['rationale']}</p>
+                    <div class="badge">{{ city.recommendation }}</div>
+                    <h3>Priority: {{ city.priority }}</h3>
+                    <p><strong>Rationale:</strong> {{ city.rationale }}</p>
                     <ul>
-                        <li><strong>Budget:</strong> {city_info['budget']}</li>
-                        <li><strong>Timeline:</strong> {city_info['timeline']}</li>
+                        <li><strong>Budget:</strong> {{ city.budget }}</li>
+                        <li><strong>Timeline:</strong> {{ city.timeline }}</li>
                     </ul>
                 </div>
             </div>
@@ -362,33 +325,15 @@ for city_key, city_info in cities_config.items():
                         </tr>
                     </thead>
                     <tbody>
-"""
-    
-    # Calculate and add scenario rows
-    for scenario_name, (pop_mult, rent_mult, vitality_mult, displacement_mult) in city_info['scenarios'].items():
-        new_pop = int(city_baseline['population'] * pop_mult)
-        new_rent = city_baseline['rent_eur'] * rent_mult
-        new_vitality = city_baseline['vitality'] * vitality_mult
-        new_displacement = city_baseline['displacement'] * displacement_mult
-        
-        pop_change = f"{(pop_mult - 1) * 100:+.1f}%"
-        rent_change = f"{(rent_mult - 1) * 100:+.1f}%"
-        vitality_change = f"{(vitality_mult - 1) * 100:+.1f}%"
-        displacement_change = f"{(displacement_mult - 1) * 100:+.1f}%"
-        
-        winner_class = "winner" if scenario_name == city_info['recommendation'] else ""
-        
-        html += f"""
+                        {% for row in scenarios %}
                         <tr>
-                            <td><strong>{scenario_name}</strong></td>
-                            <td>{new_pop:,} {pop_change}</td>
-                            <td>€{new_rent:.2f}</td>
-                            <td>{new_vitality:.3f} {vitality_change}</td>
-                            <td>{new_displacement:.3f} {displacement_change}</td>
+                            <td><strong>{{ row.name }}</strong></td>
+                            <td>{{ '{:,}'.format(row.population) }} {{ row.pop_change }}</td>
+                            <td>€{{ '{:.2f}'.format(row.rent) }}</td>
+                            <td>{{ '{:.3f}'.format(row.vitality) }} {{ row.vitality_change }}</td>
+                            <td>{{ '{:.3f}'.format(row.displacement) }} {{ row.displacement_change }}</td>
                         </tr>
-"""
-    
-    html += """
+                        {% endfor %}
                     </tbody>
                 </table>
             </div>
@@ -422,26 +367,13 @@ for city_key, city_info in cities_config.items():
                 <div class="metrics-grid">
                     <div class="metric-card">
                         <div class="label">Population Target</div>
-                        <div class="value">"""
-    
-    # Calculate targets
-    if city_key == 'berlin':
-        target_pop = 971
-        target_rent = 2352.60
-    elif city_key == 'leipzig':
-        target_pop = 740
-        target_rent = 2439.75
-    else:  # munich
-        target_pop = 1086
-        target_rent = 2403.49
-    
-    html += f"""
-                        <div class="change">+{target_pop - int(city_baseline['population'])} by Year 3</div>
+                        <div class="value">
+                        <div class="change">+{{ targets.population - baseline.population }} by Year 3</div>
                     </div>
                     <div class="metric-card">
                         <div class="label">Rent Target</div>
-                        <div class="value">€{target_rent:.0f}</div>
-                        <div class="change">-€{city_baseline['rent_eur'] - target_rent:.0f}/mo</div>
+                        <div class="value">€{{ '{:.0f}'.format(targets.rent) }}</div>
+                        <div class="change">-€{{ '{:.0f}'.format(baseline.rent_eur - targets.rent) }}/mo</div>
                     </div>
                     <div class="metric-card">
                         <div class="label">Vitality Target</div>
@@ -456,40 +388,194 @@ for city_key, city_info in cities_config.items():
                 </div>
             </div>
             
-            <!-- Key Risks -->
-            <div class="section">
-                <h2>⚠️ Key Risks & Mitigation</h2>
-                <div class="recommendation-box">
-                    <h3>What Could Go Wrong?</h3>
-                    <ul>
-                        <li><strong>Unsustainable costs:</strong> Phased funding with performance gates</li>
-                        <li><strong>Gentrification:</strong> Community land trusts, rent controls</li>
-                        <li><strong>Implementation delays:</strong> 15% budget contingency, clear timelines</li>
-                        <li><strong>Political change:</strong> Multi-year contracts, broad coalition</li>
-                    </ul>
-                </div>
-            </div>
-        </div>
-        
-        <div class="footer">
-            <p>Generated: January 2026 | Analysis Tool: holistic_urban_simulator</p>
-            <p>Data Source: 3-city simulation (20 timesteps each) | Database: PostgreSQL urban_sim</p>
-        </div>
-    </div>
-</body>
-</html>
 """
+
+@lru_cache(maxsize=None)
+def _get_template():
+    """Compile the per-city dashboard template (once per process)."""
+    env = Environment(
+        loader=DictLoader({'dashboard': DASHBOARD_HTML}),
+        auto_reload=False,
+        autoescape=True,
+        trim_blocks=True,
+        lstrip_blocks=True,
+        keep_trailing_newline=True,
+    )
+    return env.get_template('dashboard')
+
+_BASELINE_QUERY = text("""
+SELECT 
+    sr.city_name,
+    ROUND(AVG(ss.population)::numeric, 0) as population,
+    ROUND(AVG(ss.avg_rent_euro)::numeric, 2) as rent_eur,
+    ROUND(AVG(ss.commercial_vitality)::numeric, 3) as vitality,
+    ROUND(AVG(ss.displacement_risk)::numeric, 3) as displacement,
+    ROUND(AVG(ss.safety_score)::numeric, 3) as safety
+FROM simulation_state ss
+JOIN simulation_run sr ON ss.run_id = sr.run_id
+WHERE sr.city_name IN ('leipzig', 'berlin', 'munich')
+AND ss.timestep = 50
+GROUP BY sr.city_name
+""")
+
+# Statement cache shared by every execution of _BASELINE_QUERY
+_COMPILED_CACHE = {}
+
+@lru_cache(maxsize=None)
+def _get_baseline_map():
+    """Timestep-50 city averages keyed by city name (queried once per process)."""
+    with db_config.engine.connect() as conn:
+        conn = conn.execution_options(compiled_cache=_COMPILED_CACHE)
+        rows = conn.execute(_BASELINE_QUERY).mappings().all()
+    
+    # ROUND() returns numeric, so values are converted to plain numbers here
+    return {
+        row['city_name']: {
+            'population': int(row['population']),
+            'rent_eur': float(row['rent_eur']),
+            'vitality': float(row['vitality']),
+            'displacement': float(row['displacement']),
+            'safety': float(row['safety']),
+        }
+        for row in rows
+    }
+
+# Policy scenario multipliers (population, rent, vitality, displacement),
+# shared by all cities
+SCENARIOS = {
+    'Baseline': (1.00, 1.00, 1.00, 1.00),
+    'Transit Investment': (1.045, 1.00, 1.15, 1.00),
+    'Affordable Housing': (1.05, 0.80, 1.00, 0.92),
+    'Green Infrastructure': (1.025, 1.02, 1.20, 1.00),
+    'Combined Policy': (1.12, 0.80, 1.35, 0.92)
+}
+SCENARIO_NAMES = list(SCENARIOS.keys())
+SCENARIO_MATRIX = np.array(list(SCENARIOS.values()), dtype=np.float64)
+
+# Percent change labels are the same for every city, so all of them are
+# formatted once here
+SCENARIO_PCT_LABELS = np.char.mod('%+.1f%%', (SCENARIO_MATRIX - 1.0) * 100.0).tolist()
+
+cities_config = {
+    'berlin': {
+        'name': 'BERLIN',
+        'emoji': '🏛️',
+        'priority': 'Livability Maximizer',
+        'color': '#E53935',
+        'recommendation': 'Combined Policy',
+        'rationale': "Berlin's affordability baseline allows aggressive intervention. Combined approach maximizes quality of life improvements across all metrics.",
+        'budget': '€50M',
+        'timeline': '3 years'
+    },
+    'leipzig': {
+        'name': 'LEIPZIG',
+        'emoji': '🏭',
+        'priority': 'Affordability Crisis Response',
+        'color': '#FFA500',
+        'recommendation': 'Affordable Housing → Combined',
+        'rationale': "Leipzig faces affordability crisis (€3,050/mo). Housing subsidy directly addresses critical need. Immediate start, add transit/green later.",
+        'budget': '€30M (→€60M Phase 2)',
+        'timeline': 'Immediate start, phased expansion'
+    },
+    'munich': {
+        'name': 'MUNICH',
+        'emoji': '🌳',
+        'priority': 'Growth Sustainer',
+        'color': '#43A047',
+        'recommendation': 'Combined Policy',
+        'rationale': "Munich has strongest baseline (970 residents). Combined policy leverages momentum, adds 116 residents while cutting rents 20%.",
+        'budget': '€60M',
+        'timeline': '3 years (full implementation)'
+    }
+}
+
+# Red channel of each accent color, used by the timeline gradient
+for city_info in cities_config.values():
+    city_info['color_r'] = int(city_info['color'][1:3], 16)
+
+# Year-3 population and rent targets per city
+TARGETS = {
+    'berlin': {'population': 971, 'rent': 2352.60},
+    'leipzig': {'population': 740, 'rent': 2439.75},
+    'munich': {'population': 1086, 'rent': 2403.49},
+}
+
+OUTPUT_DIR = Path("data/outputs/visualizations")
+
+def render_city(city_key, city_info, city_baseline, gzip_only=False):
+    """Render one city's dashboard and save it; returns the written paths.
+    
+    The page is always written gzip-compressed (.html.gz); the plain .html
+    copy for local preview is skipped when gzip_only is set.
+    """
+    # Calculate scenario rows for all scenarios and metrics in one broadcast;
+    # the template only formats them
+    baseline_values = np.array([
+        city_baseline['population'],
+        city_baseline['rent_eur'],
+        city_baseline['vitality'],
+        city_baseline['displacement'],
+    ], dtype=np.float64)
+    values = SCENARIO_MATRIX * baseline_values
+    
+    scenario_rows = [
+        {
+            'name': scenario_name,
+            'population': int(pop),
+            'rent': rent,
+            'vitality': vitality,
+            'displacement': displacement,
+            'pop_change': pop_pct,
+            'vitality_change': vitality_pct,
+            'displacement_change': displacement_pct,
+        }
+        for scenario_name, (pop, rent, vitality, displacement), (pop_pct, _, vitality_pct, displacement_pct)
+        in zip(SCENARIO_NAMES, values.tolist(), SCENARIO_PCT_LABELS)
+    ]
+    
+    html = _get_template().render(
+        city=city_info,
+        baseline=city_baseline,
+        scenarios=scenario_rows,
+        targets=TARGETS[city_key],
+    )
+    
+    page = b"".join([STATIC_HEAD_BYTES, html.encode('utf-8'), STATIC_FOOTER_BYTES])
+    
+    # Save files
+    output_path = OUTPUT_DIR / f"policy_dashboard_{city_key}.html"
+    gzip_path = output_path.with_name(output_path.name + '.gz')
+    with gzip.open(gzip_path, 'wb', compresslevel=6) as f:
+        f.write(page)
+    if gzip_only:
+        return [gzip_path]
+    
+    output_path.write_bytes(page)
+    return [output_path, gzip_path]
+
+def main(gzip_only=False):
+    print("[*] Generating city-specific policy dashboards...\n")
+    
+    baseline_map = _get_baseline_map()
+    
+    # Generate dashboard for each city
+    OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
     
-    # Save file
-    output_path = f"data/outputs/visualizations/policy_dashboard_{city_key}.html"
-    with open(output_path, 'w', encoding='utf-8') as f:
-        f.write(html)
+    generated = []
+    for city_key, city_info in cities_config.items():
+        paths = render_city(city_key, city_info, baseline_map[city_key], gzip_only=gzip_only)
+        print(f"✅ Created: {paths[0]}")
+        generated.extend(paths)
     
-    print(f"✅ Created: {output_path}")
+    print("\n[OK] City-specific policy dashboards created successfully!")
+    print("\nGenerated files:")
+    for path in generated:
+        print(f"  - {path}")
+    print("\nOpen in browser to view city-specific recommendations and scenarios.")
 
-print("\n[OK] City-specific policy dashboards created successfully!")
-print("\nGenerated files:")
-print("  - data/outputs/visualizations/policy_dashboard_berlin.html")
-print("  - data/outputs/visualizations/policy_dashboard_leipzig.html")
-print("  - data/outputs/visualizations/policy_dashboard_munich.html")
-print("\nOpen in browser to view city-specific recommendations and scenarios.")
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Generate city-specific policy dashboards')
+    parser.add_argument('--gzip-only', action='store_true',
+                        help='Only write the gzip-compressed dashboards (.html.gz)')
+    args = parser.parse_args()
+    main(gzip_only=args.gzip_only)
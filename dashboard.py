@@ -24,17 +24,64 @@ Usage:
 """
 
 import sys
+import hashlib
+import inspect
 from pathlib import Path
 import pandas as pd
 import numpy as np
 from datetime import datetime
+import plotly
 import plotly.graph_objects as go
+import plotly.io as pio
 import plotly.express as px
 from plotly.subplots import make_subplots
 
 # Add src to path
 sys.path.insert(0, str(Path(__file__).parent / 'src'))
 
+from database.result_cache import CACHE_DIR, cache_path, load_cached, store_cached
+
+def _cached_read_csv(path):
+    """Read a CSV, reusing a parquet copy while the file is unchanged.
+    
+    Each CSV path gets its own cache namespace, keyed by the file's
+    modification time and size, so editing or replacing the CSV makes the
+    next load parse it again. Storing a new copy removes the file's older
+    ones.
+    """
+    stat = path.stat()
+    path_hash = hashlib.sha1(str(path.resolve()).encode()).hexdigest()[:12]
+    namespace = f"csv_{path.stem}_{path_hash}"
+    key = f"{stat.st_mtime_ns}-{stat.st_size}"
+    # Version 2: parsed by the pyarrow engine with Arrow-backed dtypes
+    df = load_cached(namespace, key, version=2)
+    if df is not None:
+        return df
+    
+    try:
+        # Arrow's multithreaded parser, keeping the Arrow-backed columns
+        df = pd.read_csv(path, encoding='latin-1', engine='pyarrow', dtype_backend='pyarrow')
+    except ImportError:
+        df = pd.read_csv(path, encoding='latin-1')
+    try:
+        store_cached(namespace, key, df, version=2)
+    except (OSError, ValueError, TypeError) as e:
+        # Columns parquet can't store just mean no cache for this file
+        print(f"  [WARN] Could not cache {path.name}: {e}")
+        return df
+    current = cache_path(namespace, key, version=2)
+    for stale in CACHE_DIR.glob(f"{namespace}_v*.parquet"):
+        if stale != current:
+            stale.unlink(missing_ok=True)
+    return df
+
+def _static_chart_path(factory):
+    """Cached JSON path of a chart built only from literals, else None."""
+    key = STATIC_CHART_KEYS.get(factory.__name__)
+    if key is None:
+        return None
+    return CACHE_DIR / f"chart_{factory.__name__}_{key}.json"
+
 class UrbanSimulatorDashboard:
     """Dashboard for Urban Simulator calibration and validation."""
     
@@ -42,17 +89,23 @@ class UrbanSimulatorDashboard:
         """Initialize dashboard with data loading."""
         self.data_dir = Path(data_dir)
         self.data = {}
+        self._charts = {}
         self.load_data()
     
     def load_data(self):
         """Load all available data files."""
         print("[*] Loading calibration data...")
+        # Charts built from previously loaded data are stale now
+        self._charts = {}
         
         # Real rent calibration data
         rent_file = self.data_dir / 'real_rent_calibration_2024.csv'
         if rent_file.exists():
             try:
-                self.data['real_rents'] = pd.read_csv(rent_file, encoding='latin-1')
+                # Categorical city codes for the per-city groupby, float32 rents
+                self.data['real_rents'] = _cached_read_csv(rent_file).astype(
+                    {'city': 'category', 'avg_rent_eur': np.float32}
+                )
                 print(f"  [OK] Loaded real rent data: {len(self.data['real_rents'])} neighborhoods")
             except Exception as e:
                 print(f"  [WARN] Could not load real rent data: {e}")
@@ -61,7 +114,9 @@ class UrbanSimulatorDashboard:
         pop_file = self.data_dir / 'population_scaling_factors.csv'
         if pop_file.exists():
             try:
-                self.data['population'] = pd.read_csv(pop_file, encoding='latin-1')
+                self.data['population'] = _cached_read_csv(pop_file).astype(
+                    {'scaling_factor': np.float32}
+                )
                 print(f"  [OK] Loaded population scaling data")
             except Exception as e:
                 print(f"  [WARN] Could not load population data: {e}")
@@ -70,7 +125,9 @@ class UrbanSimulatorDashboard:
         baseline_file = self.data_dir / 'baseline_simulation_state.csv'
         if baseline_file.exists():
             try:
-                self.data['baseline'] = pd.read_csv(baseline_file, encoding='latin-1')
+                baseline = _cached_read_csv(baseline_file)
+                floats = [col for col, dtype in baseline.dtypes.items() if pd.api.types.is_float_dtype(dtype)]
+                self.data['baseline'] = baseline.astype(dict.fromkeys(floats, np.float32))
                 print(f"  [OK] Loaded baseline simulation: {len(self.data['baseline'])} records")
             except Exception as e:
                 print(f"  [WARN] Could not load baseline data: {e}")
@@ -79,11 +136,45 @@ class UrbanSimulatorDashboard:
         zone_file = self.data_dir / 'zone_definitions_2024.csv'
         if zone_file.exists():
             try:
-                self.data['zones'] = pd.read_csv(zone_file, encoding='latin-1')
+                self.data['zones'] = _cached_read_csv(zone_file)
                 print(f"  [OK] Loaded zone definitions")
             except Exception as e:
                 print(f"  [WARN] Could not load zone definitions: {e}")
     
+    def _chart(self, factory):
+        """Build a chart once per loaded data set and reuse it afterwards."""
+        name = factory.__name__
+        if name not in self._charts:
+            self._charts[name] = factory()
+        return self._charts[name]
+    
+    def _chart_json(self, factory):
+        """Serialized figure of one dashboard chart, or None without data.
+        
+        Charts listed in STATIC_CHART_KEYS are read from and written to an
+        on-disk JSON copy, so they are only rebuilt when their factory's
+        source changes.
+        """
+        path = _static_chart_path(factory)
+        if path is not None and path.exists():
+            return path.read_text(encoding='utf-8')
+        
+        fig = self._chart(factory)
+        if isinstance(fig, tuple):
+            # The rent comparison also returns its city summary table
+            fig = fig[0]
+        if fig is None:
+            return None
+        
+        payload = pio.to_json(fig, validate=False, pretty=False)
+        if path is not None:
+            try:
+                CACHE_DIR.mkdir(parents=True, exist_ok=True)
+                path.write_text(payload, encoding='utf-8')
+            except OSError as e:
+                print(f"  [WARN] Could not cache {factory.__name__}: {e}")
+        return payload
+    
     def create_rent_comparison_chart(self):
         """Create rent calibration comparison chart."""
         if 'real_rents' not in self.data:
@@ -92,20 +183,44 @@ class UrbanSimulatorDashboard:
         df = self.data['real_rents']
         
         # Summary by city
-        city_summary = df.groupby('city').agg({
-            'avg_rent_eur': ['mean', 'std', 'min', 'max']
-        }).round(0)
+        rents = df.groupby('city', sort=True, observed=True)['avg_rent_eur']
+        city_summary = rents.agg(['mean', 'std', 'min', 'max']).round(0)
         
         fig = go.Figure()
         
-        cities = df['city'].unique()
-        for city in sorted(cities):
-            city_data = df[df['city'] == city]
-            rents = city_data['avg_rent_eur'].values
+        # One box per city, in sorted order. Boxes are passed precomputed
+        # statistics, so plotly.js does not re-sort every city's rents in the
+        # browser; they follow plotly's own rules (linear quartiles, i.e. the
+        # Hazen method, 1.5 * IQR whisker fences, population sd). A city with
+        # rents outside the fences keeps its raw values so the outliers are
+        # still drawn as points. With grid-cell rents nearly every city has
+        # such outliers, so the precomputed path mostly helps small,
+        # city-level inputs. Missing rents are dropped first, as plotly does
+        for city, city_rents in rents:
+            city_rents = city_rents.dropna()
+            if city_rents.empty:
+                continue
+            y = city_rents.to_numpy(dtype=np.float64)
+            q1, median, q3 = np.quantile(y, [0.25, 0.5, 0.75], method='hazen')
+            iqr = q3 - q1
+            if ((y < q1 - 1.5 * iqr) | (y > q3 + 1.5 * iqr)).any():
+                fig.add_trace(go.Box(
+                    y=city_rents.to_numpy(dtype=np.float32),
+                    name=city,
+                    boxmean='sd'
+                ))
+                continue
             
+            # Without outliers the fences are the extreme rents
             fig.add_trace(go.Box(
-                y=rents,
                 name=city,
+                q1=[q1],
+                median=[median],
+                q3=[q3],
+                lowerfence=[y.min()],
+                upperfence=[y.max()],
+                mean=[y.mean()],
+                sd=[y.std()],
                 boxmean='sd'
             ))
         
@@ -289,26 +404,34 @@ class UrbanSimulatorDashboard:
         """Create displacement risk visualization."""
         fig = go.Figure()
         
-        # Displacement rates by income segment
-        displacement_risk = np.linspace(0, 1, 11)
+        # Displacement rates by income segment, one row per curve in a single
+        # preallocated array: each curve is clipped in place to its cap and
+        # zeroed below its risk threshold
+        displacement_risk = np.linspace(0, 1, 11, dtype=np.float32)
+        curves = np.zeros((3, displacement_risk.size), dtype=np.float32)
+        low_income, middle_income, high_income = curves
         
         # Low income: max 20% outmigration at risk > 0.4
-        low_income_displacement = np.where(
-            displacement_risk > 0.4,
-            np.minimum(0.20, displacement_risk * 0.25),
-            0
-        ) * 100
+        np.multiply(displacement_risk, 0.25, out=low_income)
+        np.clip(low_income, 0, 0.20, out=low_income)
+        low_income[displacement_risk <= 0.4] = 0
         
         # Middle income: max 10% outmigration at risk > 0.6
-        middle_income_displacement = np.where(
-            displacement_risk > 0.6,
-            np.minimum(0.10, (displacement_risk - 0.6) * 0.2),
-            0
-        ) * 100
+        np.subtract(displacement_risk, 0.6, out=middle_income)
+        middle_income *= 0.2
+        np.clip(middle_income, 0, 0.10, out=middle_income)
+        middle_income[displacement_risk <= 0.6] = 0
+        
+        # High income attraction (negative "displacement" = inflow)
+        np.multiply(displacement_risk, 0.15, out=high_income)
+        np.clip(high_income, 0, 0.05, out=high_income)
+        high_income[displacement_risk <= 0.5] = 0
+        
+        curves *= 100
         
         fig.add_trace(go.Scatter(
             x=displacement_risk,
-            y=low_income_displacement,
+            y=low_income,
             name='Low Income (30%)',
             mode='lines+markers',
             line=dict(color='#ff6b6b', width=3)
@@ -316,22 +439,15 @@ class UrbanSimulatorDashboard:
         
         fig.add_trace(go.Scatter(
             x=displacement_risk,
-            y=middle_income_displacement,
+            y=middle_income,
             name='Middle Income (40%)',
             mode='lines+markers',
             line=dict(color='#4ecdc4', width=3)
         ))
         
-        # High income attraction (negative "displacement" = inflow)
-        high_income_attraction = np.where(
-            (displacement_risk > 0.5),
-            np.minimum(0.05, displacement_risk * 0.15),
-            0
-        ) * 100
-        
         fig.add_trace(go.Scatter(
             x=displacement_risk,
-            y=-high_income_attraction,
+            y=-high_income,
             name='High Income Attraction (30%)',
             mode='lines+markers',
             line=dict(color='#45b7d1', width=3, dash='dash')
@@ -371,13 +487,18 @@ class UrbanSimulatorDashboard:
         
         df_modules = pd.DataFrame(modules_data)
         
+        # Colour by tier with one palette lookup: priority 0 red, 1-2 teal,
+        # 3+ grey
+        palette = np.array(['#95a5a6', '#4ecdc4', '#ff6b6b'])
+        priority = df_modules['Priority'].to_numpy()
+        tier = np.where(priority == 0, 2, np.where(priority < 3, 1, 0))
+        
         fig = go.Figure()
         
         fig.add_trace(go.Bar(
             x=df_modules['Module'],
             y=df_modules['Priority'],
-            marker_color=['#ff6b6b' if p == 0 else '#4ecdc4' if p < 3 else '#95a5a6' 
-                         for p in df_modules['Priority']],
+            marker_color=palette[tier].tolist(),
             text=df_modules['Priority'],
             textposition='auto'
         ))
@@ -515,7 +636,7 @@ class UrbanSimulatorDashboard:
         # Create subplots
         from plotly.subplots import make_subplots
         
-        html_content = """
+        parts = ["""
         <!DOCTYPE html>
         <html>
         <head>
@@ -605,30 +726,35 @@ class UrbanSimulatorDashboard:
                     <br>
                     <strong>Calibration:</strong> Housing sensitivity reduced 52.3% | Demographics module integrated
                 </div>
-        """
-        
-        # Add charts
-        charts = [
-            ('Rent Calibration Comparison', self.create_calibration_accuracy_chart()),
-            ('Calibration Error Reduction', self.create_error_analysis_chart()),
-            ('Real Rent Distribution', self.create_rent_comparison_chart()[0]),
-            ('Population Scaling Factors', self.create_population_scaling_chart()),
-            ('Demographics Composition', self.create_demographics_summary()),
-            ('Displacement Mechanics', self.create_displacement_mechanics_chart()),
-            ('Module Priority Matrix', self.create_module_priority_chart()),
-            ('Calibration Timeline', self.create_calibration_timeline())
+        """]
+        
+        # Add charts. Static charts with a cached JSON copy are not rebuilt
+        chart_specs = [
+            ('Rent Calibration Comparison', self.create_calibration_accuracy_chart),
+            ('Calibration Error Reduction', self.create_error_analysis_chart),
+            ('Real Rent Distribution', self.create_rent_comparison_chart),
+            ('Population Scaling Factors', self.create_population_scaling_chart),
+            ('Demographics Composition', self.create_demographics_summary),
+            ('Displacement Mechanics', self.create_displacement_mechanics_chart),
+            ('Module Priority Matrix', self.create_module_priority_chart),
+            ('Calibration Timeline', self.create_calibration_timeline)
         ]
-        
-        for idx, (title, fig) in enumerate(charts):
-            if fig is not None:
-                html_content += f"""
+        # Charts that have data, with their position kept as the element id
+        charts_live = []
+        for idx, (title, factory) in enumerate(chart_specs):
+            payload = self._chart_json(factory)
+            if payload is not None:
+                charts_live.append((idx, title, payload))
+        
+        for idx, title, payload in charts_live:
+            parts.append(f"""
                 <div class="chart-container">
                     <div class="chart-title">{title}</div>
                     <div id="chart-{idx}"></div>
                 </div>
-                """
+                """)
         
-        html_content += """
+        parts.append("""
                 <div class="footer">
                     <p>Generated: """ + datetime.now().strftime('%B %d, %Y at %H:%M:%S') + """</p>
                     <p>Repository: https://github.com/sivanarayanchalla/holistic-urban-simulator</p>
@@ -636,26 +762,43 @@ class UrbanSimulatorDashboard:
             </div>
             
             <script>
-        """
+        """)
         
-        for idx, (title, fig) in enumerate(charts):
-            if fig is not None:
-                html_content += f"""
-                Plotly.newPlot('chart-{idx}', {fig.to_json()}['data'], {fig.to_json()}['layout']);
-                """
+        for idx, title, payload in charts_live:
+            # Each figure is serialized once; plot it from the JS variable
+            parts.append(f"""
+                var f{idx} = {payload};
+                Plotly.newPlot('chart-{idx}', f{idx}.data, f{idx}.layout);
+                """)
         
-        html_content += """
+        parts.append("""
             </script>
         </body>
         </html>
-        """
+        """)
         
-        with open(output_file, 'w', encoding='utf-8') as f:
-            f.write(html_content)
+        # Join once and write in one call instead of growing one string
+        Path(output_file).write_text("".join(parts), encoding='utf-8')
         
         print(f"[OK] Dashboard saved to: {output_file}")
         return output_file
 
+# Charts drawn only from literals in their factory. Their cached JSON is keyed
+# on the factory source and the plotly version, so changing either rebuilds it
+STATIC_CHART_KEYS = {
+    name: hashlib.sha1(
+        (inspect.getsource(getattr(UrbanSimulatorDashboard, name)) + plotly.__version__).encode()
+    ).hexdigest()
+    for name in (
+        'create_calibration_accuracy_chart',
+        'create_error_analysis_chart',
+        'create_demographics_summary',
+        'create_displacement_mechanics_chart',
+        'create_module_priority_chart',
+        'create_calibration_timeline',
+    )
+}
+
 def main():
     """Main execution function."""
     print("\n" + "="*70)
@@ -11,13 +11,15 @@ print('\n' + '='*80)
 print('[PHASE 1 AUDIT] Extract Baseline Values & Grid Metrics')
 print('='*80)
 
-# ============================================================================
-# SECTION 1: Grid Metrics Overview
-# ============================================================================
-print('\n[1] GRID METRICS BY CITY')
-print('-' * 80)
-
+# One connection serves every section. A failed query rolls back its
+# transaction so the sections after it can still run.
 with db_config.engine.connect() as conn:
+    # ============================================================================
+    # SECTION 1: Grid Metrics Overview
+    # ============================================================================
+    print('\n[1] GRID METRICS BY CITY')
+    print('-' * 80)
+    
     # Get grid dimensions and coverage
     query = text('''
         SELECT 
@@ -35,15 +37,15 @@ with db_config.engine.connect() as conn:
         print("\nLeipzig Grid:")
         print(result.to_string(index=False))
     except Exception as e:
+        conn.rollback()
         print(f"[WARN] Could not query grid metrics: {e}")
-
-# ============================================================================
-# SECTION 2: Simulation Runs Overview
-# ============================================================================
-print('\n\n[2] RECENT SIMULATION RUNS')
-print('-' * 80)
-
-with db_config.engine.connect() as conn:
+    
+    # ============================================================================
+    # SECTION 2: Simulation Runs Overview
+    # ============================================================================
+    print('\n\n[2] RECENT SIMULATION RUNS')
+    print('-' * 80)
+    
     query = text('''
         SELECT 
             run_id,
@@ -61,17 +63,16 @@ with db_config.engine.connect() as conn:
         print(runs.to_string(index=False))
     else:
         print("[INFO] No simulation runs found in database")
-
-# ============================================================================
-# SECTION 3: Initial State (Timestep 0)
-# ============================================================================
-print('\n\n[3] BASELINE STATE AT TIMESTEP 0')
-print('-' * 80)
-
-with db_config.engine.connect() as conn:
+    
+    # ============================================================================
+    # SECTIONS 3 & 4: Initial (Timestep 0) and Final (Timestep 50) State
+    # ============================================================================
+    # Both timesteps come from one scan of simulation_state; each section prints
+    # its own slice
     query = text('''
         SELECT 
             sr.city_name,
+            ss.timestep,
             COUNT(DISTINCT ss.grid_id) as num_cells,
             ROUND(AVG(ss.population)::numeric, 1) as avg_population,
             ROUND(MIN(ss.population)::numeric, 1) as min_population,
@@ -84,63 +85,49 @@ with db_config.engine.connect() as conn:
             ROUND(AVG(ss.employment)::numeric, 1) as avg_employment
         FROM simulation_state ss
         JOIN simulation_run sr ON ss.run_id = sr.run_id
-        WHERE ss.timestep = 0
-        GROUP BY sr.city_name
-        ORDER BY sr.city_name
+        WHERE ss.timestep IN (0, 50)
+        GROUP BY sr.city_name, ss.timestep
+        ORDER BY sr.city_name, ss.timestep
     ''')
     
     try:
-        baseline = pd.read_sql(query, conn)
+        state_stats = pd.read_sql(query, conn)
+        state_error = None
+    except Exception as e:
+        conn.rollback()
+        state_stats = None
+        state_error = e
+    
+    print('\n\n[3] BASELINE STATE AT TIMESTEP 0')
+    print('-' * 80)
+    
+    if state_stats is None:
+        print(f"[WARN] Could not retrieve timestep 0 data: {state_error}")
+    else:
+        baseline = state_stats[state_stats['timestep'] == 0].drop(columns='timestep')
         if not baseline.empty:
             print("\nTimestep 0 Baseline Metrics:")
             print(baseline.to_string(index=False))
         else:
             print("[INFO] No timestep 0 data found (simulations may have started at timestep 1)")
-    except Exception as e:
-        print(f"[WARN] Could not retrieve timestep 0 data: {e}")
-
-# ============================================================================
-# SECTION 4: Final State (Timestep 50)
-# ============================================================================
-print('\n\n[4] FINAL STATE AT TIMESTEP 50')
-print('-' * 80)
-
-with db_config.engine.connect() as conn:
-    query = text('''
-        SELECT 
-            sr.city_name,
-            COUNT(DISTINCT ss.grid_id) as num_cells,
-            ROUND(AVG(ss.population)::numeric, 1) as avg_population,
-            ROUND(MIN(ss.population)::numeric, 1) as min_population,
-            ROUND(MAX(ss.population)::numeric, 1) as max_population,
-            ROUND(STDDEV(ss.population)::numeric, 1) as stddev_population,
-            ROUND(AVG(ss.avg_rent_euro)::numeric, 2) as avg_rent_eur,
-            ROUND(MIN(ss.avg_rent_euro)::numeric, 2) as min_rent_eur,
-            ROUND(MAX(ss.avg_rent_euro)::numeric, 2) as max_rent_eur,
-            ROUND(AVG(ss.housing_units)::numeric, 1) as avg_housing_units,
-            ROUND(AVG(ss.employment)::numeric, 1) as avg_employment
-        FROM simulation_state ss
-        JOIN simulation_run sr ON ss.run_id = sr.run_id
-        WHERE ss.timestep = 50
-        GROUP BY sr.city_name
-        ORDER BY sr.city_name
-    ''')
     
-    try:
-        final = pd.read_sql(query, conn)
+    print('\n\n[4] FINAL STATE AT TIMESTEP 50')
+    print('-' * 80)
+    
+    if state_stats is None:
+        print(f"[WARN] Could not retrieve timestep 50 data: {state_error}")
+    else:
+        final = state_stats[state_stats['timestep'] == 50].drop(columns='timestep')
         if not final.empty:
             print("\nTimestep 50 Final Metrics:")
             print(final.to_string(index=False))
-    except Exception as e:
-        print(f"[WARN] Could not retrieve timestep 50 data: {e}")
-
-# ============================================================================
-# SECTION 5: Population & Rent Evolution
-# ============================================================================
-print('\n\n[5] METRIC EVOLUTION (Timesteps 0→10→20→30→40→50)')
-print('-' * 80)
-
-with db_config.engine.connect() as conn:
+    
+    # ============================================================================
+    # SECTION 5: Population & Rent Evolution
+    # ============================================================================
+    print('\n\n[5] METRIC EVOLUTION (Timesteps 0→10→20→30→40→50)')
+    print('-' * 80)
+    
     query = text('''
         SELECT 
             sr.city_name,
@@ -164,15 +151,15 @@ with db_config.engine.connect() as conn:
                 print(f"\n{city.upper()}:")
                 print(city_data.to_string(index=False))
     except Exception as e:
+        conn.rollback()
         print(f"[WARN] Could not retrieve evolution data: {e}")
-
-# ============================================================================
-# SECTION 6: Displacement Risk & Green Space
-# ============================================================================
-print('\n\n[6] SOCIAL & ENVIRONMENTAL METRICS AT TIMESTEP 50')
-print('-' * 80)
-
-with db_config.engine.connect() as conn:
+    
+    # ============================================================================
+    # SECTION 6: Displacement Risk & Green Space
+    # ============================================================================
+    print('\n\n[6] SOCIAL & ENVIRONMENTAL METRICS AT TIMESTEP 50')
+    print('-' * 80)
+    
     query = text('''
         SELECT 
             sr.city_name,
@@ -194,15 +181,15 @@ with db_config.engine.connect() as conn:
             print("\nSocial & Environmental Metrics (Timestep 50):")
             print(social.to_string(index=False))
     except Exception as e:
+        conn.rollback()
         print(f"[WARN] Could not retrieve social metrics: {e}")
-
-# ============================================================================
-# SECTION 7: Housing & Affordability
-# ============================================================================
-print('\n\n[7] HOUSING & AFFORDABILITY AT TIMESTEP 50')
-print('-' * 80)
-
-with db_config.engine.connect() as conn:
+    
+    # ============================================================================
+    # SECTION 7: Housing & Affordability
+    # ============================================================================
+    print('\n\n[7] HOUSING & AFFORDABILITY AT TIMESTEP 50')
+    print('-' * 80)
+    
     query = text('''
         SELECT 
             sr.city_name,
@@ -222,16 +209,16 @@ with db_config.engine.connect() as conn:
             print("\nHousing & Affordability Metrics (Timestep 50):")
             print(housing.to_string(index=False))
     except Exception as e:
+        conn.rollback()
         print(f"[WARN] Could not retrieve housing metrics: {e}")
-
-# ============================================================================
-# SECTION 8: Export Baseline CSV for Analysis
-# ============================================================================
-print('\n\n[8] EXPORTING BASELINE DATA TO CSV')
-print('-' * 80)
-
-try:
-    with db_config.engine.connect() as conn:
+    
+    # ============================================================================
+    # SECTION 8: Export Baseline CSV for Analysis
+    # ============================================================================
+    print('\n\n[8] EXPORTING BASELINE DATA TO CSV')
+    print('-' * 80)
+    
+    try:
         # Export all states for all cities and timesteps
         query = text('''
             SELECT 
@@ -254,9 +241,9 @@ try:
             JOIN simulation_run sr ON ss.run_id = sr.run_id
             ORDER BY sr.city_name, ss.timestep, ss.grid_id
         ''')
-        
+    
         baseline_data = pd.read_sql(query, conn)
-        
+    
         if not baseline_data.empty:
             output_file = 'data/outputs/baseline_simulation_state.csv'
             baseline_data.to_csv(output_file, index=False)
@@ -266,9 +253,10 @@ try:
             print(f"   Grid cells per city: ~{len(baseline_data[baseline_data['timestep']==0]) // 3}")
         else:
             print("[INFO] No baseline data available to export")
-            
-except Exception as e:
-    print(f"[WARN] Could not export baseline data: {e}")
+        
+    except Exception as e:
+        conn.rollback()
+        print(f"[WARN] Could not export baseline data: {e}")
 
 # ============================================================================
 # SECTION 9: Summary & Next Steps
@@ -98,8 +98,8 @@ def main():
     print("\n2. View comparison dashboards in:")
     print("   data/outputs/visualizations/")
     print("\nKey files to open:")
-    print("  - city_performance_matrix.html (Heatmap of metrics)")
-    print("  - multi_city_comparison.html (Radar chart comparison)")
+    print("  - city_performance_matrix.png (Heatmap of metrics)")
+    print("  - multi_city_comparison.png (Radar chart comparison)")
     print("  - correlation_*.html (Feature correlations by city)")
 
 if __name__ == '__main__':
@@ -1180,6 +1180,17 @@ class UrbanModel:
         except Exception as e:
             print(f"  ⚠️  Could not update run status: {e}")
         
+        # Aggregate this run alone into the per-run summary tables, if installed
+        for table in ('sim_run_metrics', 'simulation_run_timestep_agg'):
+            try:
+                with db_config.get_session() as session:
+                    if session.execute(text("SELECT to_regclass(:table)"), {'table': table}).scalar() is not None:
+                        session.execute(text(f"SELECT add_{table}(CAST(:run_id AS uuid))"),
+                                        {'run_id': self.run_id})
+                        session.commit()
+            except Exception as e:
+                print(f"  ⚠️  Could not add run to {table}: {e}")
+        
         end_time = datetime.now()
         duration = (end_time - start_time).total_seconds()
         
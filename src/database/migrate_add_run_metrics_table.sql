@@ -0,0 +1,96 @@
+-- Migration: Per-run metrics summary table
+-- Date: October 16, 2026
+-- Description: Stores the whole-run aggregates that analyze_multi_city.py reads
+--   (averages plus the timestep-50 Gini inequality index) once per completed run.
+--   simulation_state rows don't change after a run is marked 'completed', so
+--   each run only has to be aggregated once. The simulation engine calls
+--   add_sim_run_metrics(run_id) when a run completes, which aggregates that
+--   run alone; the cost doesn't grow with the number of stored runs. Runs not
+--   in the table yet are aggregated on the fly by the analysis script.
+--
+-- To add a run by hand:
+--   SELECT add_sim_run_metrics('<run_id>');
+
+CREATE TABLE IF NOT EXISTS sim_run_metrics (
+    run_id UUID PRIMARY KEY REFERENCES simulation_run(run_id) ON DELETE CASCADE,
+    num_cells BIGINT,
+    num_timesteps BIGINT,
+    avg_population NUMERIC,
+    avg_rent NUMERIC,
+    avg_employment NUMERIC,
+    avg_safety NUMERIC,
+    avg_vitality NUMERIC,
+    avg_transit NUMERIC,
+    avg_air_quality NUMERIC,
+    avg_green_space NUMERIC,
+    avg_social_cohesion NUMERIC,
+    inequality_index FLOAT
+);
+
+-- Aggregates one completed run and (re)writes its row
+CREATE OR REPLACE FUNCTION add_sim_run_metrics(p_run_id UUID) RETURNS void
+LANGUAGE sql AS $$
+DELETE FROM sim_run_metrics WHERE run_id = p_run_id;
+
+INSERT INTO sim_run_metrics
+WITH run_state AS (
+    SELECT ss.*
+    FROM simulation_state ss
+    JOIN simulation_run sr ON sr.run_id = ss.run_id
+    WHERE ss.run_id = p_run_id AND sr.status = 'completed'
+),
+metrics AS (
+    SELECT
+        run_id,
+        COUNT(*) as num_cells,
+        COUNT(DISTINCT timestep) as num_timesteps,
+        ROUND(AVG(population)::numeric, 2) as avg_population,
+        ROUND(AVG(avg_rent_euro)::numeric, 2) as avg_rent,
+        ROUND(AVG(employment)::numeric, 2) as avg_employment,
+        ROUND(AVG(safety_score)::numeric, 2) as avg_safety,
+        ROUND(AVG(commercial_vitality)::numeric, 2) as avg_vitality,
+        ROUND(AVG(public_transit_accessibility)::numeric, 2) as avg_transit,
+        ROUND(AVG(air_quality_index)::numeric, 2) as avg_air_quality,
+        ROUND(AVG(green_space_ratio)::numeric, 2) as avg_green_space,
+        ROUND(AVG(social_cohesion_index)::numeric, 2) as avg_social_cohesion
+    FROM run_state
+    GROUP BY run_id
+),
+final_state AS (
+    SELECT population, avg_rent_euro
+    FROM run_state
+    WHERE timestep = 50
+),
+ranked AS (
+    SELECT 'population' as metric, population::float as x,
+           ROW_NUMBER() OVER (ORDER BY population) as i
+    FROM final_state WHERE population IS NOT NULL
+    UNION ALL
+    SELECT 'rent' as metric, avg_rent_euro::float as x,
+           ROW_NUMBER() OVER (ORDER BY avg_rent_euro) as i
+    FROM final_state WHERE avg_rent_euro IS NOT NULL
+),
+gini AS (
+    SELECT
+        COALESCE(
+            2 * SUM(i * x) / NULLIF(COUNT(*) * SUM(x), 0) - (COUNT(*) + 1.0) / COUNT(*),
+            0
+        ) as gini
+    FROM ranked
+    GROUP BY metric
+)
+SELECT
+    m.*,
+    COALESCE((SELECT AVG(gini) FROM gini), 0) as inequality_index
+FROM metrics m;
+$$;
+
+-- Backfill runs that completed before this migration
+SELECT add_sim_run_metrics(sr.run_id)
+FROM simulation_run sr
+WHERE sr.status = 'completed'
+AND NOT EXISTS (SELECT 1 FROM sim_run_metrics m WHERE m.run_id = sr.run_id);
+
+-- Verify migration
+SELECT run_id, num_cells, num_timesteps, inequality_index
+FROM sim_run_metrics;
@@ -0,0 +1,51 @@
+-- Migration: Covering (run_id, timestep) index on simulation_state
+-- Date: October 16, 2026
+-- Description: The analysis scripts filter simulation_state by run_id and either
+--   sort by timestep or pick one timestep (final / MAX). INCLUDE-ing the columns
+--   the infrastructure, spillover and policy analyses project lets those queries
+--   run as index-only scans with no heap fetches; MAX(timestep) per run is a
+--   backward scan of the index. Requires the EV columns migration
+--   (migrate_add_ev_columns.sql) and PostgreSQL 11+.
+--
+--   The covering index replaces the plain (run_id, timestep) index, named
+--   idx_simulation_state_run_timestep by schema_definition.sql and
+--   idx_state_run_timestep by the SQLAlchemy models. That index is dropped,
+--   so inserts maintain one index on this key instead of two.
+--
+-- CREATE/DROP INDEX CONCURRENTLY cannot run inside a transaction block; run
+-- this file with autocommit and stop on errors, so the old index is only
+-- dropped once the new one exists:
+--   psql -v ON_ERROR_STOP=1 -f migrate_add_state_covering_index.sql
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_simulation_state_run_timestep_covering
+    ON simulation_state (run_id, timestep)
+    INCLUDE (
+        grid_id,
+        population,
+        avg_rent_euro,
+        employment,
+        safety_score,
+        social_cohesion_index,
+        public_transit_accessibility,
+        air_quality_index,
+        chargers_count,
+        ev_capacity_kw,
+        commercial_vitality,
+        displacement_risk,
+        traffic_congestion
+    );
+
+-- Same key as the covering index, which now serves its lookups
+DROP INDEX CONCURRENTLY IF EXISTS idx_simulation_state_run_timestep;
+DROP INDEX CONCURRENTLY IF EXISTS idx_state_run_timestep;
+
+-- Refresh planner statistics so the new index is considered immediately
+ANALYZE simulation_state;
+
+-- Verify migration
+SELECT indexname, indexdef
+FROM pg_indexes
+WHERE tablename = 'simulation_state'
+AND indexname IN ('idx_simulation_state_run_timestep_covering',
+                  'idx_simulation_state_run_timestep',
+                  'idx_state_run_timestep');
@@ -0,0 +1,64 @@
+-- Migration: Per-timestep run aggregates summary table
+-- Date: October 16, 2026
+-- Description: Stores the per-timestep averages that analyze_policy_impact.py
+--   reads (one row per run and timestep) for completed runs, so the policy
+--   analysis looks up a few rows instead of averaging every cell of the run.
+--   The simulation engine calls add_simulation_run_timestep_agg(run_id) when a
+--   run completes, which aggregates that run alone. Runs not in the table yet
+--   are aggregated on the fly by the analysis script.
+--
+-- To add a run by hand:
+--   SELECT add_simulation_run_timestep_agg('<run_id>');
+
+-- Lookups are by run_id ordered by timestep, which the primary key covers
+CREATE TABLE IF NOT EXISTS simulation_run_timestep_agg (
+    run_id UUID REFERENCES simulation_run(run_id) ON DELETE CASCADE,
+    timestep INTEGER,
+    avg_population FLOAT,
+    avg_rent FLOAT,
+    avg_displacement FLOAT,
+    avg_congestion FLOAT,
+    avg_safety FLOAT,
+    avg_air_quality FLOAT,
+    avg_employment FLOAT,
+    avg_vitality FLOAT,
+    avg_cohesion FLOAT,
+    avg_transit FLOAT,
+    PRIMARY KEY (run_id, timestep)
+);
+
+-- Aggregates one completed run and (re)writes its rows
+CREATE OR REPLACE FUNCTION add_simulation_run_timestep_agg(p_run_id UUID) RETURNS void
+LANGUAGE sql AS $$
+DELETE FROM simulation_run_timestep_agg WHERE run_id = p_run_id;
+
+INSERT INTO simulation_run_timestep_agg
+SELECT
+    ss.run_id,
+    ss.timestep,
+    AVG(ss.population)::float8 as avg_population,
+    AVG(ss.avg_rent_euro) as avg_rent,
+    AVG(ss.displacement_risk) as avg_displacement,
+    AVG(ss.traffic_congestion) as avg_congestion,
+    AVG(ss.safety_score) as avg_safety,
+    AVG(ss.air_quality_index) as avg_air_quality,
+    AVG(ss.employment)::float8 as avg_employment,
+    AVG(ss.commercial_vitality) as avg_vitality,
+    AVG(ss.social_cohesion_index) as avg_cohesion,
+    AVG(ss.public_transit_accessibility) as avg_transit
+FROM simulation_state ss
+JOIN simulation_run sr ON sr.run_id = ss.run_id
+WHERE ss.run_id = p_run_id AND sr.status = 'completed'
+GROUP BY ss.run_id, ss.timestep;
+$$;
+
+-- Backfill runs that completed before this migration
+SELECT add_simulation_run_timestep_agg(sr.run_id)
+FROM simulation_run sr
+WHERE sr.status = 'completed'
+AND NOT EXISTS (SELECT 1 FROM simulation_run_timestep_agg a WHERE a.run_id = sr.run_id);
+
+-- Verify migration
+SELECT run_id, COUNT(*) as timesteps
+FROM simulation_run_timestep_agg
+GROUP BY run_id;
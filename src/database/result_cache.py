@@ -0,0 +1,100 @@
+"""
+On-disk parquet cache for query results of completed simulation runs.
+
+Rows of a run never change once its status is 'completed', and run_id is a
+UUID assigned once per run, so (namespace, version, run_id) is a stable cache
+key. Callers bump a namespace's version whenever its query, formula or dtypes
+change; storing a frame removes the run's files from older versions.
+
+To clear the cache, call clear_cache() (optionally for one namespace) or
+delete data/outputs/cache.
+"""
+from pathlib import Path
+from typing import Callable, Iterable, Optional
+
+import pandas as pd
+
+CACHE_DIR = Path("data/outputs/cache")
+
+def cache_path(namespace: str, run_id, version: int = 1) -> Path:
+    """Path of the cached frame for one run, query kind and query version."""
+    return CACHE_DIR / f"{namespace}_v{version}_{run_id}.parquet"
+
+def load_cached(namespace: str, run_id, version: int = 1) -> Optional[pd.DataFrame]:
+    """Return the cached frame, or None on a cache miss."""
+    path = cache_path(namespace, run_id, version)
+    if not path.exists():
+        return None
+    return pd.read_parquet(path)
+
+def store_cached(namespace: str, run_id, df: pd.DataFrame, version: int = 1) -> None:
+    """Write a frame to the cache, evicting the run's older versions."""
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    path = cache_path(namespace, run_id, version)
+    df.to_parquet(path, compression='zstd', index=False)
+    for stale in CACHE_DIR.glob(f"{namespace}_v*_{run_id}.parquet"):
+        if stale != path:
+            stale.unlink(missing_ok=True)
+
+def clear_cache(namespace: Optional[str] = None) -> int:
+    """Delete cached files, all of them or one namespace's; returns the count."""
+    if not CACHE_DIR.exists():
+        return 0
+    removed = 0
+    for path in CACHE_DIR.glob(f"{namespace}_*" if namespace else "*"):
+        if path.is_file():
+            path.unlink(missing_ok=True)
+            removed += 1
+    return removed
+
+def cached_frame(namespace: str, run_id, compute: Callable[[], Optional[pd.DataFrame]],
+                 version: int = 1) -> Optional[pd.DataFrame]:
+    """Load a run's frame from the cache, computing and storing it on a miss.
+
+    Empty or None results are returned as-is and not cached, so a run that is
+    queried before its state rows exist is retried next time.
+    """
+    df = load_cached(namespace, run_id, version)
+    if df is not None:
+        return df
+
+    df = compute()
+    if df is not None and not df.empty:
+        store_cached(namespace, run_id, df, version)
+    return df
+
+def cached_frames(namespace: str, run_ids: Iterable, compute: Callable[[list], Optional[pd.DataFrame]],
+                  key: str = 'run_id', version: int = 1) -> Optional[pd.DataFrame]:
+    """Multi-run variant of cached_frame.
+
+    compute(missing_run_ids) is called once for all cache misses and must
+    return a frame with a `key` column; its rows are cached per run. If it
+    returns None, the cached runs are still returned; None means no run had
+    data.
+    """
+    run_ids = [str(r) for r in run_ids]
+    records = []
+    missing = []
+    for run_id in run_ids:
+        df = load_cached(namespace, run_id, version)
+        if df is None:
+            missing.append(run_id)
+        else:
+            records.extend(df.to_dict('records'))
+
+    if missing:
+        fresh = compute(missing)
+        if fresh is None:
+            # Keep the runs that were already cached
+            return pd.DataFrame.from_records(records) if records else None
+        fresh = fresh.astype({key: str})
+        for run_id, group in fresh.groupby(key, sort=False):
+            store_cached(namespace, run_id, group, version)
+        if not records:
+            return fresh
+        records.extend(fresh.to_dict('records'))
+
+    if not records:
+        return None
+    # One frame from plain rows instead of concatenating per-run frames
+    return pd.DataFrame.from_records(records)
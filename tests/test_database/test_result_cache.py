@@ -0,0 +1,96 @@
+"""
+Tests for the on-disk result cache (no database needed).
+"""
+import pandas as pd
+import pytest
+
+from src.database import result_cache
+from src.database.result_cache import (
+    cache_path, cached_frame, cached_frames, clear_cache, load_cached, store_cached
+)
+
+RUN_A = "00000000-0000-0000-0000-00000000000a"
+RUN_B = "00000000-0000-0000-0000-00000000000b"
+
+@pytest.fixture(autouse=True)
+def tmp_cache_dir(tmp_path, monkeypatch):
+    """Point the cache at a fresh temporary directory."""
+    cache_dir = tmp_path / "cache"
+    monkeypatch.setattr(result_cache, "CACHE_DIR", cache_dir)
+    return cache_dir
+
+def test_cached_frame_round_trip():
+    """A miss computes and stores the frame; the next call is a hit."""
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return pd.DataFrame({"timestep": [0, 50], "avg_rent": [800.0, 950.0]})
+
+    first = cached_frame("policy_metrics", RUN_A, compute)
+    assert cache_path("policy_metrics", RUN_A).exists()
+
+    second = cached_frame("policy_metrics", RUN_A, compute)
+    assert len(calls) == 1
+    pd.testing.assert_frame_equal(first, second)
+
+def test_cached_frame_does_not_store_empty_results():
+    """None and empty frames are returned but not cached."""
+    assert cached_frame("policy_metrics", RUN_A, lambda: None) is None
+    assert cached_frame("policy_metrics", RUN_A, lambda: pd.DataFrame()).empty
+    assert load_cached("policy_metrics", RUN_A) is None
+
+def test_version_bump_evicts_older_files(tmp_cache_dir):
+    """Storing a new version removes the run's files from older versions."""
+    store_cached("run_metrics", RUN_A, pd.DataFrame({"x": [1]}), version=1)
+    store_cached("run_metrics", RUN_B, pd.DataFrame({"x": [2]}), version=1)
+
+    store_cached("run_metrics", RUN_A, pd.DataFrame({"x": [3]}), version=2)
+
+    assert not cache_path("run_metrics", RUN_A, version=1).exists()
+    assert load_cached("run_metrics", RUN_A, version=2)["x"].tolist() == [3]
+    # Other runs keep their files until they are stored again
+    assert cache_path("run_metrics", RUN_B, version=1).exists()
+
+def test_cached_frames_merges_cached_and_fresh_runs():
+    """Cached runs are loaded; only the misses are passed to compute."""
+    store_cached("run_metrics", RUN_A, pd.DataFrame({"run_id": [RUN_A], "avg_rent": [900.0]}))
+    requested = []
+
+    def compute(missing):
+        requested.extend(missing)
+        return pd.DataFrame({"run_id": missing, "avg_rent": [1100.0] * len(missing)})
+
+    df = cached_frames("run_metrics", [RUN_A, RUN_B], compute)
+
+    assert requested == [RUN_B]
+    assert sorted(zip(df["run_id"], df["avg_rent"])) == [(RUN_A, 900.0), (RUN_B, 1100.0)]
+    assert cache_path("run_metrics", RUN_B).exists()
+
+def test_cached_frames_keeps_cached_runs_when_compute_returns_none():
+    """A failed miss query still returns the runs already cached."""
+    store_cached("run_metrics", RUN_A, pd.DataFrame({"run_id": [RUN_A], "avg_rent": [900.0]}))
+
+    df = cached_frames("run_metrics", [RUN_A, RUN_B], lambda missing: None)
+
+    assert df["run_id"].tolist() == [RUN_A]
+
+def test_cached_frames_returns_none_without_any_data():
+    """None only when no run is cached and compute has nothing."""
+    assert cached_frames("run_metrics", [RUN_A, RUN_B], lambda missing: None) is None
+
+def test_clear_cache_for_one_namespace():
+    """clear_cache(namespace) leaves other namespaces alone."""
+    store_cached("run_metrics", RUN_A, pd.DataFrame({"x": [1]}))
+    store_cached("run_metrics", RUN_B, pd.DataFrame({"x": [2]}))
+    store_cached("policy_metrics", RUN_A, pd.DataFrame({"x": [3]}))
+
+    assert clear_cache("run_metrics") == 2
+    assert load_cached("run_metrics", RUN_A) is None
+    assert load_cached("policy_metrics", RUN_A) is not None
+
+    assert clear_cache() == 1
+
+def test_clear_cache_without_cache_dir():
+    """Clearing a cache that was never written removes nothing."""
+    assert clear_cache() == 0